@@ -1,33 +1,128 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
 from parler.admin import TranslatableAdmin
-from .models import Course, Profile, Enrollment, Lesson, Grade
+from .models import Course, Profile, Enrollment, Lesson, Grade, translations_prefetch
 from django.utils.translation import gettext_lazy as _
 
+# Таблиці, більші за цю кількість рядків, показують у списку оцінену, а не точну кількість
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+def estimate_row_count(model):
+    """
+    Приблизна кількість рядків таблиці без COUNT(*) по всій таблиці.
+
+    PostgreSQL зберігає оцінку в pg_class; для інших баз береться діапазон первинних
+    ключів, який читається з індексу двома пошуками.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    bounds = model._default_manager.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return 0
+    return bounds['high'] - bounds['low'] + 1
+
+
+# Пагінатор, який для великих таблиць без фільтрів не рахує рядки через COUNT(*)
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            estimate = estimate_row_count(self.object_list.model)
+            if estimate > ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+# Спільні налаштування списків: переклади пов'язаних моделей одним запитом і пошук за перекладеними назвами
+class ChangeListMixin:
+    # Пари (модель, шлях до її перекладів), які завантажуються разом зі сторінкою списку
+    translation_prefetches = []
+    # Пари (шлях до перекладної моделі, модель): пошук за назвою її перекладу будь-якою мовою
+    translated_search_fields = []
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.prefetch_related(*(
+            translations_prefetch(model, lookup) for model, lookup in self.translation_prefetches
+        ))
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Кожне слово запиту шукається в search_fields і в назвах перекладів.
+
+        Переклади перевіряються підзапитом id IN (...), а не JOIN з таблицею перекладів,
+        тож рядки не дублюються і DISTINCT не потрібен.
+        """
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            condition = Q()
+            for field in self.search_fields:
+                condition |= Q(**{f'{field}__icontains': bit})
+            for path, model in self.translated_search_fields:
+                translations = model._parler_meta.root_model.objects.filter(title__icontains=bit)
+                condition |= Q(**{f'{path}__in': translations.values('master_id')})
+            queryset = queryset.filter(condition)
+        return queryset, False
+
+
 # Клас CourseAdmin наслідується від TranslatableAdmin і визначає властивості адміністратора курсів.
-class CourseAdmin(TranslatableAdmin):
+class CourseAdmin(ChangeListMixin, TranslatableAdmin):
     list_display = ['title', 'teacher']  # Властивість list_display визначає, які поля відображаються у списку курсів у панелі адміністратора.
-    search_fields = ['title', 'teacher__user__username']  # Поля для пошуку в списку курсів у панелі адміністратора.
+    list_select_related = ['teacher__user']
+    translation_prefetches = [(Course, 'translations')]
+    search_fields = ['teacher__user__username']  # Поля для пошуку в списку курсів у панелі адміністратора.
+    translated_search_fields = [('id', Course)]
+    raw_id_fields = ['teacher']
 
 # Клас ProfileAdmin визначає властивості адміністратора профілів.
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'role']  # Властивість list_display визначає, які поля відображаються у списку профілів у панелі адміністратора.
+    list_select_related = ['user']
     search_fields = ['user__username', 'role']  # Поля для пошуку в списку профілів у панелі адміністратора.
+    raw_id_fields = ['user']
 
 # Клас EnrollmentAdmin визначає властивості адміністратора записів на курси.
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(ChangeListMixin, admin.ModelAdmin):
     list_display = ['course', 'student']  # Властивість list_display визначає, які поля відображаються у списку записів на курси у панелі адміністратора.
-    search_fields = ['course__title', 'student__user__username']  # Поля для пошуку в списку записів на курси у панелі адміністратора.
+    list_select_related = ['course', 'student__user']
+    translation_prefetches = [(Course, 'course__translations')]
+    search_fields = ['student__user__username']  # Поля для пошуку в списку записів на курси у панелі адміністратора.
+    translated_search_fields = [('course', Course)]
+    raw_id_fields = ['course', 'student']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 # Клас LessonAdmin наслідується від TranslatableAdmin і визначає властивості адміністратора занять.
-class LessonAdmin(TranslatableAdmin):
+class LessonAdmin(ChangeListMixin, TranslatableAdmin):
     list_display = ['title', 'course', 'schedule']  # Властивість list_display визначає, які поля відображаються у списку занять у панелі адміністратора.
-    search_fields = ['title', 'course__title']  # Поля для пошуку в списку занять у панелі адміністратора.
+    list_select_related = ['course']
+    translation_prefetches = [(Lesson, 'translations'), (Course, 'course__translations')]
+    search_fields = ['course__teacher__user__username']  # Поля для пошуку в списку занять у панелі адміністратора.
+    translated_search_fields = [('id', Lesson), ('course', Course)]
     date_hierarchy = 'schedule'  # Поля для фільтрації занять за датою у панелі адміністратора.
+    raw_id_fields = ['course']
 
 # Клас GradeAdmin визначає властивості адміністратора оцінок.
-class GradeAdmin(admin.ModelAdmin):
+class GradeAdmin(ChangeListMixin, admin.ModelAdmin):
     list_display = ['lesson', 'student', 'grade']  # Властивість list_display визначає, які поля відображаються у списку оцінок у панелі адміністратора.
-    search_fields = ['lesson__title', 'student__user__username']  # Поля для пошуку в списку оцінок у панелі адміністратора.
+    list_select_related = ['lesson__course', 'student__user']
+    translation_prefetches = [(Lesson, 'lesson__translations'), (Course, 'lesson__course__translations')]
+    search_fields = ['student__user__username']  # Поля для пошуку в списку оцінок у панелі адміністратора.
+    translated_search_fields = [('lesson', Lesson)]
+    raw_id_fields = ['lesson', 'student']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 # Реєстрація моделей та їх властивостей адміністратора в панелі адміністратора Django.
 admin.site.register(Course, CourseAdmin)
@@ -0,0 +1,193 @@
+import warnings
+from itertools import chain
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Aggregate, TextField, Value
+from django.db.models.functions import Concat
+from django.utils.translation import get_language
+
+from .caching import GRADEBOOK_TIMEOUT, course_version
+from .gradebook import cached_gradebook
+from .models import Grade
+
+ANALYTICS_KEY = 'journal:analytics:{course_id}:{version}:{language}'
+PERCENTILES = (10, 25, 75, 90)
+# Межі інтервалів розподілу оцінок: 0-9, 10-19, ..., 90-100
+DISTRIBUTION_BINS = 10
+
+
+class GroupConcat(Aggregate):
+    """Агрегат SQLite GROUP_CONCAT: значення стовпця через кому одним рядком."""
+    function = 'GROUP_CONCAT'
+    output_field = TextField()
+
+
+def _grade_columns(course):
+    """Стовпці student_id, lesson_id, grade оцінок курсу як масиви numpy."""
+    grades = Grade.objects.filter(lesson__course=course)
+    if connection.vendor == 'sqlite':
+        # Один рядок "student,lesson,grade,student,lesson,grade,..." замість десятків тисяч
+        # кортежів: розбір чисел у numpy значно швидший. Трійки складаються в SQL, тому
+        # їх порядок у GROUP_CONCAT (який SQLite не гарантує) не впливає на відповідність стовпців.
+        cells = grades.aggregate(cells=GroupConcat(Concat(
+            'student_id', Value(','), 'lesson_id', Value(','), 'grade', output_field=TextField(),
+        )))['cells']
+        return np.fromstring(cells or '', sep=',', dtype=np.int64).reshape(-1, 3).T
+    rows = grades.values_list('student_id', 'lesson_id', 'grade')
+    return np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 3).T
+
+
+def grade_array(course, student_ids, lesson_ids):
+    """
+    Оцінки курсу як щільний масив float розміром (студенти, заняття) за один запит.
+
+    Відсутні оцінки мають значення NaN.
+    """
+    array = np.full((len(student_ids), len(lesson_ids)), np.nan)
+    student_col, lesson_col, values = _grade_columns(course)
+    if not values.size or not array.size:
+        return array
+
+    # Перетворення id на індекси рядків і стовпців через пошук у відсортованих масивах
+    rows_index, row_mask = _positions(np.asarray(student_ids, dtype=np.int64), student_col)
+    cols_index, col_mask = _positions(np.asarray(lesson_ids, dtype=np.int64), lesson_col)
+    mask = row_mask & col_mask
+    array[rows_index[mask], cols_index[mask]] = values[mask]
+    return array
+
+
+def _positions(ids, values):
+    """Індекси values у масиві ids та маска значень, які там є."""
+    order = np.argsort(ids)
+    sorted_ids = ids[order]
+    found = np.searchsorted(sorted_ids, values)
+    found = np.minimum(found, len(ids) - 1)
+    mask = sorted_ids[found] == values
+    return order[found], mask
+
+
+def nan_quantiles(array, quantiles, axis):
+    """
+    Квантилі (0-100) уздовж осі без урахування NaN, лінійна інтерполяція як у numpy.
+
+    Один np.sort замість np.nanpercentile, який для NaN обробляє кожен рядок окремо.
+    Повертає масив розміром (len(quantiles), довжина іншої осі).
+    """
+    ordered = np.sort(np.moveaxis(array, axis, -1), axis=-1)  # NaN опиняються в кінці
+    count = (~np.isnan(ordered)).sum(axis=-1)
+    positions = np.multiply.outer(np.asarray(quantiles) / 100, np.maximum(count - 1, 0))
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+    weight = positions - lower
+    ordered = np.broadcast_to(ordered, (len(quantiles),) + ordered.shape)
+    low_values = np.take_along_axis(ordered, lower[..., None], axis=-1)[..., 0]
+    high_values = np.take_along_axis(ordered, upper[..., None], axis=-1)[..., 0]
+    result = low_values + (high_values - low_values) * weight
+    return np.where(count > 0, result, np.nan)
+
+
+def summarize(array, axis):
+    """
+    Статистика масиву оцінок уздовж осі axis (0 - по заняттях, 1 - по студентах).
+
+    Повертає словник масивів однакової довжини; NaN означає, що оцінок немає.
+    """
+    count = array.shape[axis]
+    graded = ~np.isnan(array)
+    # Номер інтервалу кожної оцінки; -1 для відсутніх
+    bins = np.where(graded, np.minimum(np.nan_to_num(array) // 10, DISTRIBUTION_BINS - 1), -1)
+    distribution = np.stack([(bins == b).sum(axis=axis) for b in range(DISTRIBUTION_BINS)], axis=-1)
+    if not count:
+        # Без жодного рядка редукції numpy не визначені; один рядок NaN дає NaN у результаті
+        array = np.full(array.shape[:axis] + (1,) + array.shape[axis + 1:], np.nan)
+
+    with warnings.catch_warnings():
+        # Рядки без жодної оцінки дають NaN і попередження, яке тут не потрібне
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median, *percentiles = nan_quantiles(array, (50,) + PERCENTILES, axis=axis)
+        return {
+            'mean': np.nanmean(array, axis=axis),
+            'median': median,
+            'std': np.nanstd(array, axis=axis),
+            'min': np.nanmin(array, axis=axis),
+            'max': np.nanmax(array, axis=axis),
+            'percentiles': dict(zip(map(str, PERCENTILES), percentiles)),
+            'graded': graded.sum(axis=axis),
+            'missing': count - graded.sum(axis=axis),
+            'distribution': distribution,
+        }
+
+
+def _to_python(value):
+    """Масиви numpy у списки з None замість NaN, придатні для JSON і кешу."""
+    if isinstance(value, dict):
+        return {key: _to_python(item) for key, item in value.items()}
+    if value.dtype.kind == 'f':
+        rounded = np.round(value, 2).astype(object)
+        rounded[np.isnan(value)] = None
+        return rounded.tolist()
+    return value.tolist()
+
+
+def _rows(labels, stats):
+    """Статистика у вигляді списку словників, по одному на заняття чи студента."""
+    columns = {
+        key: value for key, value in stats.items() if key != 'percentiles'
+    }
+    return [
+        dict(
+            label,
+            **{key: column[i] for key, column in columns.items()},
+            percentiles={p: values[i] for p, values in stats['percentiles'].items()},
+        )
+        for i, label in enumerate(labels)
+    ]
+
+
+def _student_name(student):
+    user = student['user']
+    return f"{user['first_name']} {user['last_name']}".strip() or user['username']
+
+
+def course_analytics(course):
+    """
+    Аналітика оцінок курсу: статистика по заняттях, студентах і загалом.
+
+    Підписи занять і студентів беруться з кешованого журналу, оцінки - одним запитом.
+    """
+    gradebook = cached_gradebook(course)
+    lessons = gradebook['lessons']
+    students = gradebook['students']
+    array = grade_array(
+        course,
+        [student['id'] for student in students],
+        [lesson['id'] for lesson in lessons],
+    )
+
+    overall = summarize(array.reshape(-1, 1), axis=0)
+    return {
+        'course': {'id': course.id, 'title': course.title},
+        'shape': {'students': len(students), 'lessons': len(lessons)},
+        'percentiles': list(PERCENTILES),
+        'lessons': _rows(
+            [{'id': lesson['id'], 'title': lesson['title']} for lesson in lessons],
+            _to_python(summarize(array, axis=0)),
+        ),
+        'students': _rows(
+            [{'id': student['id'], 'name': _student_name(student)} for student in students],
+            _to_python(summarize(array, axis=1)),
+        ),
+        'overall': _rows([{}], _to_python(overall))[0],
+    }
+
+
+def cached_course_analytics(course):
+    """Аналітика курсу з кешу; ключ містить версію курсу, як і ключ журналу."""
+    key = ANALYTICS_KEY.format(course_id=course.id, version=course_version(course.id), language=get_language())
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = course_analytics(course)
+        cache.set(key, analytics, GRADEBOOK_TIMEOUT)
+    return analytics
@@ -0,0 +1,117 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.contrib.auth.decorators import login_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponseForbidden, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.translation import get_language, gettext as _
+from django.views.decorators.http import require_GET
+
+from .caching import course_student_ids, course_version, home_courses
+from .gradebook import cached_gradebook
+from .models import Course
+
+
+def _json(payload, etag):
+    response = JsonResponse(payload)
+    response['ETag'] = etag
+    # Клієнт може зберігати відповідь, але має перевіряти її через If-None-Match
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified(request, etag):
+    """Відповідь 304, якщо If-None-Match збігається з etag, інакше None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def course_api(view):
+    """
+    Декоратор API курсу: перевіряє доступ і повертає 304 до виконання представлення.
+
+    ETag складається з версії курсу (її збільшує будь-яка зміна занять, записів,
+    оцінок чи імен викладача і студентів), мови та області видимості: викладач бачить увесь журнал, студент -
+    лише свій рядок. Тому на 304 не витрачається жодного запиту до оцінок.
+    """
+    @wraps(view)
+    @login_required
+    @require_GET
+    def wrapper(request, course_id):
+        teacher_id = Course.objects.filter(id=course_id).values_list('teacher_id', flat=True).first()
+        if teacher_id is None:
+            raise Http404
+        profile = request.user.profile
+        if teacher_id == profile.id:
+            scope = 'teacher'
+        elif profile.id in course_student_ids(course_id):
+            scope = f'student{profile.id}'
+        else:
+            return HttpResponseForbidden(_("You do not have access to this course."))
+
+        etag = f'"{view.__name__}-{course_id}-{course_version(course_id)}-{get_language()}-{scope}"'
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+        student_id = None if scope == 'teacher' else profile.id
+        return _json(view(request, Course(id=course_id), student_id), etag)
+    return wrapper
+
+
+@login_required
+@require_GET
+def course_list(request):
+    """Курси користувача [{'id', 'title'}]; ETag - хеш вмісту списку."""
+    payload = {'courses': home_courses(request.user.profile)}
+    digest = hashlib.sha1(json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True).encode()).hexdigest()
+    etag = f'"courses-{digest}"'
+    return _not_modified(request, etag) or _json(payload, etag)
+
+
+@course_api
+def course_info(request, course, student_id):
+    course = Course.objects.with_translations().select_related('teacher__user').get(id=course.id)
+    teacher = course.teacher.user
+    return {
+        'id': course.id,
+        'title': course.title,
+        'description': course.description,
+        'teacher': {'id': teacher.id, 'username': teacher.username,
+                    'first_name': teacher.first_name, 'last_name': teacher.last_name},
+    }
+
+
+@course_api
+def course_lessons(request, course, student_id):
+    return {'lessons': cached_gradebook(course)['lessons']}
+
+
+@course_api
+def course_enrollments(request, course, student_id):
+    enrollments = cached_gradebook(course)['enrollments']
+    if student_id is not None:
+        enrollments = [e for e in enrollments if e['student']['id'] == student_id]
+    return {'enrollments': enrollments}
+
+
+@course_api
+def course_gradebook(request, course, student_id):
+    """
+    Журнал у вигляді матриці: grades[i][j] - оцінка студента students[i] за заняття lessons[j].
+
+    Студент отримує лише власний рядок.
+    """
+    data = cached_gradebook(course)
+    lesson_ids = [lesson['id'] for lesson in data['lessons']]
+    student_ids = [student['id'] for student in data['students']]
+    if student_id is not None:
+        student_ids = [sid for sid in student_ids if sid == student_id]
+    return {
+        'lessons': lesson_ids,
+        'students': student_ids,
+        'grades': [[data['grades'][sid][lid] for lid in lesson_ids] for sid in student_ids],
+    }
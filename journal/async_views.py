@@ -0,0 +1,113 @@
+"""
+Асинхронні версії представлень home, view_profile та course_detail для роботи під ASGI.
+
+Незалежні групи запитів запускаються через asyncio.gather з асинхронним ORM Django.
+POST-запити передаються синхронним представленням.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseForbidden
+from django.shortcuts import render
+from django.utils.translation import gettext as _
+
+from . import views
+from .caching import acourse_student_ids, ahome_courses
+from .dashboard import aload_profile_dashboard
+from .gradebook import acached_gradebook_window
+from .models import Course, Profile
+
+
+def async_login_required(view):
+    """
+    login_required для асинхронних представлень.
+
+    Користувач і його профіль завантажуються заздалегідь і підставляються в request.user,
+    щоб шаблони не звертались до бази синхронно.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        user.profile = await Profile.objects.aget(user=user)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_login_required
+async def home(request):
+    """Домашня сторінка з курсами користувача."""
+    courses = await ahome_courses(request.user.profile)
+    return render(request, 'home.html', {'courses': courses})
+
+
+@async_login_required
+async def view_profile(request, user_id):
+    """Відображення профілю користувача."""
+    if request.method == 'POST':
+        return await sync_to_async(views.view_profile)(request, user_id)
+
+    try:
+        user = await User.objects.select_related('profile').aget(pk=user_id)
+    except User.DoesNotExist:
+        raise Http404
+    is_teacher = request.user.profile.role == 'teacher'
+    course_details = await aload_profile_dashboard(user.profile, request.user.profile, is_teacher)
+
+    return render(request, 'profile.html', {
+        'userStudent': user,
+        'profile': user.profile,
+        'course_details': course_details,
+        'is_teacher': is_teacher,
+    })
+
+
+@async_login_required
+async def course_detail(request, course_id):
+    """Деталі курсу."""
+    if request.method == 'POST':
+        return await sync_to_async(views.course_detail)(request, course_id)
+
+    profile = request.user.profile
+    is_teacher = profile.role == 'teacher'
+    window = views.window_cursors(request)
+
+    async def load_course():
+        try:
+            return await Course.objects.with_translations().aget(id=course_id)
+        except Course.DoesNotExist:
+            raise Http404
+
+    if is_teacher:
+        # Доступ перевіряється до завантаження журналу, щоб чужий курс не коштував запитів
+        course = await load_course()
+        if course.teacher_id != profile.id:
+            return HttpResponseForbidden(_("You are not the teacher of this course."))
+        gradebook = await acached_gradebook_window(course, **window)
+        context = {
+            'enrollments': gradebook['enrollments'],
+            'edit_mode': request.GET.get('edit') == '1',
+        }
+    else:
+        course, student_ids = await asyncio.gather(load_course(), acourse_student_ids(course_id))
+        context = {'enrolled': profile.id in student_ids}
+        if not context['enrolled']:
+            # Сторінка курсу з кнопкою запису, без журналу
+            context.update({'course': course, 'is_teacher': False})
+            return render(request, 'course_detail.html', context)
+        gradebook = await acached_gradebook_window(course, **window)
+        context['students'] = gradebook['students']
+
+    context.update({
+        'course': course,
+        'lessons': gradebook['lessons'],
+        'is_teacher': is_teacher,
+        'grades': gradebook['grades'],
+        **views.window_links(request, gradebook['pages']),
+    })
+    return render(request, 'course_detail.html', context)
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import BaseBackend, ModelBackend
+
+
+def _session_user(user_id, can_authenticate):
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+    except UserModel.DoesNotExist:
+        return None
+    return user if can_authenticate(user) else None
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend, що завантажує користувача сесії разом з профілем одним запитом."""
+
+    def get_user(self, user_id):
+        return _session_user(user_id, self.user_can_authenticate)
+
+
+class LegacySessionBackend(BaseBackend):
+    """
+    Лише відновлює користувача сесій, створених до появи ProfileBackend.
+
+    Паролі не перевіряє (authenticate з BaseBackend повертає None), тому не хешує
+    пароль вдруге і не заважає наступним бекендам. Міграція 0014 переписує шлях
+    ModelBackend у таких сесіях на цей клас.
+    """
+
+    def get_user(self, user_id):
+        return _session_user(user_id, ModelBackend().user_can_authenticate)
@@ -0,0 +1,424 @@
+import asyncio
+import copy
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from middleware.session_log_writer import temporary_session_log
+
+from .datagen import generate_dataset
+from .gradebook import load_gradebook, save_grades
+from .models import Course, Enrollment, Grade, Lesson, Profile
+
+# Параметри generate_dataset для кожного розміру набору даних
+DATASETS = {
+    'small': dict(teachers=2, courses=4, students=50, lessons_per_course=10,
+                  courses_per_student=2, grade_density=0.8),
+    'medium': dict(teachers=5, courses=10, students=300, lessons_per_course=30,
+                   courses_per_student=3, grade_density=0.8),
+    'large': dict(teachers=10, courses=20, students=2000, lessons_per_course=60,
+                  courses_per_student=3, grade_density=0.8),
+}
+
+# Регресія часу фіксується лише якщо різниця більша за цей поріг (мс), щоб не реагувати на шум
+MIN_TIME_DELTA_MS = 2.0
+
+
+@contextmanager
+def benchmark_database():
+    """Тимчасові тестова база даних і журнал сесій, щоб не змінювати робочі."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with temporary_session_log():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed_profile_courses(username, courses, lessons_per_course):
+    """Студент, записаний на `courses` курсів з оцінками за кожне заняття."""
+    teacher_user = User.objects.create_user(username=f'{username}_teacher')
+    teacher = Profile.objects.create(user=teacher_user, role='teacher')
+    student_user = User.objects.create_user(username=username)
+    student = Profile.objects.create(user=student_user, role='student')
+
+    start = timezone.now()
+    for i in range(courses):
+        course = Course.objects.create(teacher=teacher, title=f'Course {i}', description='')
+        Enrollment.objects.create(course=course, student=student)
+        for j in range(lessons_per_course):
+            lesson = Lesson.objects.create(
+                course=course, title=f'Lesson {j}', schedule=start + timedelta(days=j)
+            )
+            Grade.objects.create(lesson=lesson, student=student, grade=(i + j) % 101)
+    return student
+
+
+def measure(func, repeat=5):
+    """
+    Медіанний і максимальний час (мс), кількість запитів до БД та пікова пам'ять (КБ).
+
+    Кеш очищується перед кожним запуском, щоб вимірювати холодний шлях.
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(context.captured_queries)
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def time_request(client, url, repeat=5):
+    """Медіанний час відповіді (мс) та кількість запитів до БД для GET-запиту."""
+    return measure(lambda: client.get(url), repeat=repeat)
+
+
+def benchmark_profile(sizes, lessons_per_course=10, repeat=5):
+    """Час відображення профілю студента залежно від кількості записів на курси."""
+    results = []
+    for size in sizes:
+        student = seed_profile_courses(f'bench_student_{size}', size, lessons_per_course)
+        client = Client()
+        client.force_login(student.user)
+        url = reverse('view_profile', args=[student.user.id])
+        result = time_request(client, url, repeat=repeat)
+        result['enrollments'] = size
+        results.append(result)
+    return results
+
+
+def _client_for(profile):
+    client = Client()
+    client.force_login(profile.user)
+    return client
+
+
+def scenarios():
+    """Сценарії набору: назва -> функція без аргументів, що виконує запит."""
+    # Найбільший курс набору даних та його учасники
+    course = Course.objects.annotate(n=Count('enrollment')).order_by('-n', 'id').first()
+    teacher = course.teacher
+    student = Enrollment.objects.filter(course=course).select_related('student__user').first().student
+    lesson = Lesson.objects.filter(course=course).order_by('schedule').first()
+
+    teacher_client = _client_for(teacher)
+    student_client = _client_for(student)
+    course_url = reverse('course_detail', args=[course.id])
+    grade_data = {'lesson_id': lesson.id, 'student_id': student.id, 'grade': 90}
+
+    return {
+        'home_teacher': lambda: teacher_client.get(reverse('home')),
+        'home_student': lambda: student_client.get(reverse('home')),
+        'course_detail_teacher': lambda: teacher_client.get(course_url),
+        'course_detail_student': lambda: student_client.get(course_url),
+        'view_profile_student': lambda: student_client.get(
+            reverse('view_profile', args=[student.user.id])
+        ),
+        'course_analytics': lambda: teacher_client.get(reverse('course_analytics_api', args=[course.id])),
+        'grade_post': lambda: teacher_client.post(course_url, grade_data),
+    }
+
+
+def run_suite(dataset, repeat=5, only=None):
+    """Заповнює базу набором даних `dataset` і вимірює всі сценарії."""
+    seeded_at = time.perf_counter()
+    counts = generate_dataset(languages=['uk', 'en', 'de'], prefix='bench', **DATASETS[dataset])
+    seed_seconds = time.perf_counter() - seeded_at
+
+    results = {}
+    for name, func in scenarios().items():
+        if only and name not in only:
+            continue
+        results[name] = measure(func, repeat=repeat)
+
+    return {
+        'dataset': dataset,
+        'counts': counts,
+        'seed_seconds': round(seed_seconds, 2),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def asgi_scenarios():
+    """Пари URL (синхронне, асинхронне представлення) та профіль, від імені якого виконуються запити."""
+    course = Course.objects.annotate(n=Count('enrollment')).order_by('-n', 'id').first()
+    teacher = Profile.objects.select_related('user').get(id=course.teacher_id)
+    student = (
+        Enrollment.objects.filter(course=course).select_related('student__user').first().student
+    )
+    return {
+        'home_teacher': (teacher, reverse('home'), reverse('home_async')),
+        'course_detail_teacher': (
+            teacher,
+            reverse('course_detail', args=[course.id]),
+            reverse('course_detail_async', args=[course.id]),
+        ),
+        'course_detail_student': (
+            student,
+            reverse('course_detail', args=[course.id]),
+            reverse('course_detail_async', args=[course.id]),
+        ),
+        'view_profile_student': (
+            student,
+            reverse('view_profile', args=[student.user_id]),
+            reverse('view_profile_async', args=[student.user_id]),
+        ),
+    }
+
+
+async def _drive_asgi(client, url, requests, concurrency):
+    """Виконує requests GET-запитів через ASGI-обробник, не більше concurrency одночасно."""
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'requests_per_second': round(requests / elapsed, 1),
+    }
+
+
+def run_asgi_suite(dataset, requests=200, concurrency=10, only=None):
+    """
+    Порівнює синхронні й асинхронні представлення під ASGI-обробником Django.
+
+    Запити проходять повний стек ASGIHandler і middleware (як під uvicorn чи daphne,
+    але без мережі); кеш очищується перед кожним вимірюванням.
+    """
+    counts = generate_dataset(languages=['uk', 'en', 'de'], prefix='bench', **DATASETS[dataset])
+    results = {}
+    for name, (profile, sync_url, async_url) in asgi_scenarios().items():
+        if only and name not in only:
+            continue
+        client = AsyncClient()
+        client.force_login(profile.user)
+        results[name] = {}
+        for variant, url in (('sync', sync_url), ('async', async_url)):
+            cache.clear()
+            results[name][variant] = asyncio.run(_drive_asgi(client, url, requests, concurrency))
+    return {
+        'dataset': dataset,
+        'counts': counts,
+        'requests': requests,
+        'concurrency': concurrency,
+        'results': results,
+    }
+
+
+@contextmanager
+def sqlite_file_database(profile):
+    """
+    Тимчасова файлова база SQLite з профілем settings.SQLITE_PROFILES[profile].
+
+    База в пам'яті не ділиться між процесами, тому для навантаження кількох процесів
+    потрібен справжній файл.
+    """
+    settings_dict = connection.settings_dict
+    saved = {key: settings_dict[key] for key in ('OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+    saved_test_name = settings_dict['TEST'].get('NAME')
+    old_name = settings_dict['NAME']
+    with tempfile.TemporaryDirectory() as directory:
+        connection.close()
+        settings_dict.update(copy.deepcopy(settings.SQLITE_PROFILES[profile]))
+        settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings_dict.update(saved)
+            settings_dict['TEST']['NAME'] = saved_test_name
+
+
+def _read_gradebook(rng, courses):
+    """Читання: журнал випадкового курсу без кешу."""
+    load_gradebook(Course(id=rng.choice(list(courses))))
+
+
+def _write_grades(rng, courses, cells=10):
+    """Запис: як імпорт, транзакція спершу читає оцінки заняття, потім оновлює частину з них."""
+    course_id = rng.choice(list(courses))
+    lesson_ids, student_ids = courses[course_id]
+    lesson_id = rng.choice(lesson_ids)
+    with transaction.atomic():
+        list(Grade.objects.filter(lesson_id=lesson_id).values_list('student_id', 'grade'))
+        save_grades(course_id, {
+            (student_id, lesson_id): rng.randint(0, 100)
+            for student_id in rng.sample(student_ids, min(cells, len(student_ids)))
+        })
+
+
+def _sqlite_worker(seed, seconds, write_share, courses, results):
+    """Процес навантаження: випадкові читання й записи протягом seconds секунд."""
+    rng = random.Random(seed)
+    counts = Counter()
+    timings = {'read': [], 'write': []}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        kind = 'write' if rng.random() < write_share else 'read'
+        started = time.perf_counter()
+        try:
+            (_write_grades if kind == 'write' else _read_gradebook)(rng, courses)
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            counts[f'{kind}_errors'] += 1
+        else:
+            counts[kind] += 1
+            timings[kind].append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    results.put((dict(counts), timings))
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * share))], 3) if values else None
+
+
+def run_sqlite_suite(dataset, processes=4, seconds=5.0, write_share=0.2, profiles=None):
+    """
+    Навантаження SQLite кількома процесами для кожного профілю з settings.SQLITE_PROFILES.
+
+    Кожен процес відкриває власні з'єднання, як воркер gunicorn, і протягом seconds
+    секунд читає журнали та записує оцінки. Рахуються виконані операції за секунду,
+    помилки "database is locked" і p95 часу операцій.
+    """
+    results = {}
+    for profile in profiles or settings.SQLITE_PROFILES:
+        with sqlite_file_database(profile):
+            counts = generate_dataset(languages=['uk', 'en'], prefix='bench', **DATASETS[dataset])
+            courses = {}
+            for course_id, lesson_id in Lesson.objects.values_list('course_id', 'id'):
+                courses.setdefault(course_id, ([], []))[0].append(lesson_id)
+            for course_id, student_id in Enrollment.objects.values_list('course_id', 'student_id'):
+                if course_id in courses:
+                    courses[course_id][1].append(student_id)
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+            # Дочірні процеси не повинні успадкувати відкрите з'єднання
+            connections.close_all()
+
+            context = multiprocessing.get_context('fork')
+            queue = context.Queue()
+            workers = [
+                context.Process(target=_sqlite_worker, args=(seed, seconds, write_share, courses, queue))
+                for seed in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+            outcomes = [queue.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+
+        totals = Counter()
+        timings = {'read': [], 'write': []}
+        for worker_counts, worker_timings in outcomes:
+            totals.update(worker_counts)
+            for kind, values in worker_timings.items():
+                timings[kind].extend(values)
+        results[profile] = {
+            'journal_mode': journal_mode,
+            'reads_per_second': round(totals['read'] / seconds, 1),
+            'writes_per_second': round(totals['write'] / seconds, 1),
+            'read_errors': totals['read_errors'],
+            'write_errors': totals['write_errors'],
+            'read_p95_ms': _percentile(timings['read'], 0.95),
+            'write_p95_ms': _percentile(timings['write'], 0.95),
+        }
+    return {
+        'dataset': dataset,
+        'counts': counts,
+        'processes': processes,
+        'seconds': seconds,
+        'write_share': write_share,
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25, timings=False):
+    """
+    Порівнює результати з базовими; повертає список описів регресій.
+
+    Регресією вважається більша кількість запитів. Час і пам'ять залежать від машини,
+    на якій записано базові результати, тому порівнюються лише з timings=True:
+    регресія - більші за базові більш ніж на `tolerance`.
+    """
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: queries {previous['queries']} -> {current['queries']}")
+        if not timings:
+            continue
+        limit = previous['median_ms'] * (1 + tolerance)
+        if current['median_ms'] > limit and current['median_ms'] - previous['median_ms'] > MIN_TIME_DELTA_MS:
+            regressions.append(
+                f"{name}: median {previous['median_ms']:.2f} ms -> {current['median_ms']:.2f} ms"
+            )
+        if current['peak_kb'] > previous['peak_kb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {previous['peak_kb']} KB -> {current['peak_kb']} KB")
+    return regressions
+
+
+def load_report(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_report(report, path):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,168 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import get_language
+
+from .models import Course, Enrollment
+from .principals import invalidate_principals
+
+HOME_COURSES_KEY = 'journal:home-courses:{profile_id}:{language}'
+HOME_COURSES_TIMEOUT = 60 * 60
+
+COURSE_STUDENTS_KEY = 'journal:course-students:{course_id}'
+# Множина перевіряє доступ до курсу, тому живе недовго: якщо паралельний запит закешує
+# список, прочитаний до фіксації зміни, виключений студент втратить доступ за кілька хвилин
+COURSE_STUDENTS_TIMEOUT = 5 * 60
+
+COURSE_VERSION_KEY = 'journal:course-version:{course_id}'
+GRADEBOOK_KEY = 'journal:gradebook:{course_id}:{version}:{language}'
+GRADEBOOK_STATS_KEY = 'journal:gradebook-cache:{outcome}'
+GRADEBOOK_TIMEOUT = 24 * 60 * 60
+
+
+def after_commit(func, *args):
+    """
+    Викликає func(*args) після фіксації поточної транзакції, а поза транзакцією - одразу.
+
+    Кеш скидається лише тоді, коли нові дані вже видно іншим з'єднанням; інакше паралельний
+    запит міг би прочитати старі дані й знову закешувати їх під новою версією.
+    """
+    transaction.on_commit(partial(func, *args))
+
+
+def _home_courses_queryset(profile):
+    if profile.role == 'teacher':
+        queryset = Course.objects.filter(teacher=profile)
+    else:
+        queryset = Course.objects.filter(enrollment__student=profile)
+    return queryset.order_by('id').translated_values('title')
+
+
+def home_courses(profile):
+    """Курси домашньої сторінки користувача [{'id', 'title'}] з кешу або одним запитом."""
+    key = HOME_COURSES_KEY.format(profile_id=profile.id, language=get_language())
+    courses = cache.get(key)
+    if courses is None:
+        courses = list(_home_courses_queryset(profile))
+        cache.set(key, courses, HOME_COURSES_TIMEOUT)
+    return courses
+
+
+async def ahome_courses(profile):
+    """Асинхронна версія home_courses."""
+    key = HOME_COURSES_KEY.format(profile_id=profile.id, language=get_language())
+    courses = await cache.aget(key)
+    if courses is None:
+        courses = [course async for course in _home_courses_queryset(profile)]
+        await cache.aset(key, courses, HOME_COURSES_TIMEOUT)
+    return courses
+
+
+def invalidate_home_courses(profile_ids):
+    """Видаляє кешовані списки курсів профілів для всіх мов."""
+    cache.delete_many([
+        HOME_COURSES_KEY.format(profile_id=profile_id, language=language)
+        for profile_id in set(profile_ids)
+        for language, _ in settings.LANGUAGES
+    ])
+
+
+def invalidate_course_members(course_id, teacher_id=None):
+    """Скидає кеш домашньої сторінки викладача та всіх студентів курсу."""
+    profile_ids = list(Enrollment.objects.filter(course_id=course_id).values_list('student_id', flat=True))
+    if teacher_id is not None:
+        profile_ids.append(teacher_id)
+    invalidate_home_courses(profile_ids)
+
+
+def course_student_ids(course_id):
+    """
+    Множина id студентів курсу з кешу або одним запитом.
+
+    Відповідає на питання "чи записаний студент" без запиту до бази. Кеш скидається
+    після фіксації транзакції сигналами Enrollment, а після bulk_create - через
+    invalidate_course_student_ids.
+    """
+    key = COURSE_STUDENTS_KEY.format(course_id=course_id)
+    student_ids = cache.get(key)
+    if student_ids is None:
+        student_ids = frozenset(
+            Enrollment.objects.filter(course_id=course_id).values_list('student_id', flat=True)
+        )
+        cache.set(key, student_ids, COURSE_STUDENTS_TIMEOUT)
+    return student_ids
+
+
+async def acourse_student_ids(course_id):
+    """Асинхронна версія course_student_ids."""
+    key = COURSE_STUDENTS_KEY.format(course_id=course_id)
+    student_ids = await cache.aget(key)
+    if student_ids is None:
+        student_ids = frozenset([
+            student_id async for student_id in
+            Enrollment.objects.filter(course_id=course_id).values_list('student_id', flat=True)
+        ])
+        await cache.aset(key, student_ids, COURSE_STUDENTS_TIMEOUT)
+    return student_ids
+
+
+def invalidate_course_student_ids(course_id):
+    cache.delete(COURSE_STUDENTS_KEY.format(course_id=course_id))
+
+
+def course_version(course_id):
+    """Поточна версія даних курсу; змінюється при кожній зміні оцінок, занять чи записів."""
+    key = COURSE_VERSION_KEY.format(course_id=course_id)
+    version = cache.get(key)
+    if version is None:
+        # Початкова версія залежить від часу, тому після витіснення з кешу не повторює старих
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_course_version(course_id):
+    key = COURSE_VERSION_KEY.format(course_id=course_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def after_enrollments_change(course_id, student_ids):
+    """
+    Після фіксації транзакції скидає кеші, що залежать від записів на курс course_id:
+    списки курсів і Principal студентів, множину студентів курсу та версію курсу.
+
+    Викликається сигналами Enrollment і там, де записи створюються без сигналів (bulk_create).
+    """
+    after_commit(invalidate_home_courses, student_ids)
+    after_commit(invalidate_principals, student_ids)
+    after_commit(invalidate_course_student_ids, course_id)
+    after_commit(bump_course_version, course_id)
+
+
+def gradebook_cache_key(course_id, language):
+    return GRADEBOOK_KEY.format(course_id=course_id, version=course_version(course_id), language=language)
+
+
+def record_gradebook_cache(hit):
+    key = GRADEBOOK_STATS_KEY.format(outcome='hits' if hit else 'misses')
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def gradebook_cache_stats():
+    """Кількість влучань і промахів кешу журналу оцінок."""
+    outcomes = ('hits', 'misses')
+    values = cache.get_many([GRADEBOOK_STATS_KEY.format(outcome=outcome) for outcome in outcomes])
+    return {
+        outcome: values.get(GRADEBOOK_STATS_KEY.format(outcome=outcome), 0)
+        for outcome in outcomes
+    }
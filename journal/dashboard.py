@@ -0,0 +1,81 @@
+import asyncio
+
+from .models import Course, Grade, Lesson
+
+
+def profile_courses(profile, viewer_profile, is_teacher):
+    """Курси, які показуються на сторінці профілю."""
+    if is_teacher:
+        # Викладач бачить свої курси, але не оцінки зі свого ж курсу
+        courses = Course.objects.filter(teacher=viewer_profile).exclude(teacher=profile)
+    else:
+        courses = Course.objects.filter(enrollment__student=profile)
+    return courses.with_translations().order_by('id').distinct()
+
+
+def _dashboard_lessons(course_ids):
+    return (
+        Lesson.objects.filter(course_id__in=course_ids)
+        .with_translations()
+        .order_by('schedule', 'id')
+    )
+
+
+def _dashboard_grades(profile, course_ids):
+    return (
+        Grade.objects.filter(student=profile, lesson__course_id__in=course_ids)
+        .values_list('lesson_id', 'grade')
+    )
+
+
+def load_profile_dashboard(profile, viewer_profile, is_teacher):
+    """
+    Курси, заняття та оцінки профілю за три запити.
+
+    Повертає список словників {'course', 'rows'}, де rows - список
+    словників {'lesson', 'grade'} у порядку розкладу занять.
+    """
+    courses = list(profile_courses(profile, viewer_profile, is_teacher))
+    if not courses:
+        return []
+
+    course_ids = [course.id for course in courses]
+    lessons = _dashboard_lessons(course_ids)
+    grades = dict(_dashboard_grades(profile, course_ids))
+    return _dashboard_rows(courses, lessons, grades)
+
+
+async def aload_profile_dashboard(profile, viewer_profile, is_teacher):
+    """
+    Асинхронна версія load_profile_dashboard.
+
+    Заняття й оцінки фільтруються підзапитом курсів, тому всі три запити
+    не залежать один від одного і виконуються одночасно.
+    """
+    courses = profile_courses(profile, viewer_profile, is_teacher)
+    course_ids = courses.values('id')
+    courses, lessons, grades = await asyncio.gather(
+        _alist(courses),
+        _alist(_dashboard_lessons(course_ids)),
+        _alist(_dashboard_grades(profile, course_ids)),
+    )
+    return _dashboard_rows(courses, lessons, dict(grades))
+
+
+async def _alist(queryset):
+    return [item async for item in queryset]
+
+
+def _dashboard_rows(courses, lessons, grades):
+    course_ids = [course.id for course in courses]
+    rows_by_course = {course_id: [] for course_id in course_ids}
+    for lesson in lessons:
+        # Запити асинхронної версії незалежні, тож курс заняття міг з'явитися між ними
+        rows = rows_by_course.get(lesson.course_id)
+        if rows is not None:
+            rows.append({'lesson': lesson, 'grade': grades.get(lesson.id)})
+
+    return [
+        {'course': course, 'rows': rows_by_course[course.id]}
+        for course in courses
+    ]
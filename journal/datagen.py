@@ -0,0 +1,157 @@
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .models import Course, Enrollment, Grade, Lesson, Profile
+from .utils import batched
+
+
+def _insert_rows(model, columns, rows, batch_size):
+    """Вставка кортежів через executemany, по одній транзакції на пакет."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    sql = f'INSERT INTO {table} ({column_list}) VALUES ({placeholders})'
+    total = 0
+    for batch in batched(rows, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def _create_profiles(prefix, role, count, password, batch_size):
+    """Користувачі та профілі пакетами; повертає id створених профілів."""
+    profile_ids = []
+    for start in range(0, count, batch_size):
+        numbers = range(start, min(start + batch_size, count))
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=f'{prefix}_{role}{i}',
+                    first_name=f'{role.title()}{i}',
+                    last_name=prefix.title(),
+                    email=f'{prefix}_{role}{i}@example.com',
+                    password=password,
+                )
+                for i in numbers
+            ])
+            profiles = Profile.objects.bulk_create([
+                Profile(user_id=user.id, role=role) for user in users
+            ])
+        profile_ids.extend(profile.id for profile in profiles)
+    return profile_ids
+
+
+def _create_translated(model, objects, languages, batch_size):
+    """Об'єкти parler-моделі та їх переклади на всі мови пакетами."""
+    translation_model = model._parler_meta.root_model
+    ids = []
+    for batch in batched(objects, batch_size):
+        with transaction.atomic():
+            created = model.objects.bulk_create([obj for obj, _ in batch])
+            translation_model.objects.bulk_create([
+                translation_model(
+                    master_id=obj.id,
+                    language_code=language,
+                    **{field: f'{value} ({language})' for field, value in values.items()},
+                )
+                for obj, (_, values) in zip(created, batch)
+                for language in languages
+            ])
+        ids.extend(obj.id for obj in created)
+    return ids
+
+
+def generate_dataset(teachers, courses, students, lessons_per_course, courses_per_student,
+                     grade_density, languages, prefix='gen', batch_size=5000, seed=0, log=None):
+    """
+    Генерує синтетичний набір даних масовими вставками.
+
+    Повертає словник з кількістю створених рядків кожного типу.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    # Один хеш пароля для всіх користувачів: хешування - найдорожча частина створення User
+    password = make_password('password123')
+    courses_per_student = min(courses_per_student, courses)
+
+    with _bulk_load_pragmas():
+        log(f'Creating {teachers} teachers and {students} students...')
+        teacher_ids = _create_profiles(prefix, 'teacher', teachers, password, batch_size)
+        student_ids = _create_profiles(prefix, 'student', students, password, batch_size)
+
+        log(f'Creating {courses} courses...')
+        course_ids = _create_translated(
+            Course,
+            (
+                (Course(teacher_id=teacher_ids[i % teachers]),
+                 {'title': f'Course {i}', 'description': f'Description of course {i}'})
+                for i in range(courses)
+            ),
+            languages, batch_size,
+        )
+
+        log(f'Creating {courses * lessons_per_course} lessons...')
+        start = datetime(2024, 9, 1, 9, tzinfo=dt_timezone.utc)
+        lesson_ids = _create_translated(
+            Lesson,
+            (
+                (Lesson(course_id=course_id, schedule=start + timedelta(days=j)),
+                 {'title': f'Lesson {j}', 'description': f'Lesson {j} of course {course_id}'})
+                for course_id in course_ids
+                for j in range(lessons_per_course)
+            ),
+            languages, batch_size,
+        )
+        lessons_by_course = {
+            course_id: lesson_ids[i * lessons_per_course:(i + 1) * lessons_per_course]
+            for i, course_id in enumerate(course_ids)
+        }
+
+        log('Creating enrollments...')
+        enrollments = [
+            (course_id, student_id)
+            for student_id in student_ids
+            for course_id in rng.sample(course_ids, courses_per_student)
+        ]
+        enrollment_count = _insert_rows(Enrollment, ['course_id', 'student_id'], enrollments, batch_size)
+
+        log('Creating grades...')
+        grades = (
+            (lesson_id, student_id, rng.randint(0, 100))
+            for course_id, student_id in enrollments
+            for lesson_id in lessons_by_course[course_id]
+            if rng.random() < grade_density
+        )
+        grade_count = _insert_rows(Grade, ['lesson_id', 'student_id', 'grade'], grades, batch_size * 10)
+
+    return {
+        'teachers': len(teacher_ids),
+        'students': len(student_ids),
+        'courses': len(course_ids),
+        'lessons': len(lesson_ids),
+        'enrollments': enrollment_count,
+        'grades': grade_count,
+    }
+
+
+class _bulk_load_pragmas:
+    """На час завантаження SQLite не чекає fsync після кожної транзакції."""
+
+    def __enter__(self):
+        self.enabled = connection.vendor == 'sqlite' and not connection.in_atomic_block
+        if self.enabled:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous')
+                self.synchronous = cursor.fetchone()[0]
+                cursor.execute('PRAGMA synchronous = OFF')
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA synchronous = {int(self.synchronous)}')
@@ -0,0 +1,144 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .caching import after_enrollments_change
+from .gradebook import keyset_window
+from .models import Enrollment, Profile
+from .utils import batched
+
+# Кількість кандидатів на одній сторінці пошуку студентів
+SEARCH_PAGE_SIZE = 20
+# Розмір пакета id та імен у запитах IN і у вставках масового запису
+ENROLL_BATCH_SIZE = 1000
+# Скільки разів повторити пакет, якщо студента паралельно записали між перевіркою і вставкою
+ENROLL_ATTEMPTS = 3
+SEARCH_KEYSET = ('user__username', 'id')
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _prefix_filter(query):
+    """
+    Умова "ім'я користувача, ім'я чи прізвище починається з query" без урахування регістру.
+
+    Діапазон LOWER(поле) >= query AND < query + U+FFFF використовує індекси за виразом
+    з міграції 0013, на відміну від LIKE, для якого SQLite індекс не застосовує.
+    LOWER у SQLite змінює лише латиницю, тому для кирилиці шукається ще й варіант
+    з великої літери, як зазвичай пишуть імена.
+    """
+    query = query.lower()
+    prefixes = {query} if query.isascii() else {query, query.capitalize()}
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        for prefix in prefixes:
+            condition |= Q(**{f'{field}_key__gte': prefix, f'{field}_key__lt': prefix + '\uffff'})
+    return condition
+
+
+def search_students(course_id, query='', after=None, size=SEARCH_PAGE_SIZE):
+    """
+    Сторінка студентів, ще не записаних на курс, за початком імені; впорядковано за username.
+
+    Повертає (кандидати [{'id', 'username', 'name'}], курсор наступної сторінки або None).
+    """
+    students = (
+        Profile.objects.filter(role='student')
+        .exclude(id__in=Enrollment.objects.filter(course_id=course_id).values('student_id'))
+        .select_related('user')
+        .only('id', 'user__username', 'user__first_name', 'user__last_name')
+    )
+    query = query.strip()
+    if query:
+        students = students.alias(**{
+            f'{field}_key': Lower(f'user__{field}') for field in SEARCH_FIELDS
+        }).filter(_prefix_filter(query))
+
+    rows, _, next_cursor = keyset_window(students, SEARCH_KEYSET, size, after=after)
+    return [
+        {
+            'id': student.id,
+            'username': student.user.username,
+            'name': f'{student.user.first_name} {student.user.last_name}'.strip(),
+        }
+        for student in rows
+    ], next_cursor
+
+
+class EnrollmentSummary:
+    """Підсумок масового запису: додані та пропущені студенти, нерозпізнані імена."""
+
+    def __init__(self):
+        self.added = []
+        self.skipped = []  # Вже записані на курс та обрані id, що не є профілями студентів
+        self.unknown = []  # Імена, для яких немає профілю студента
+
+
+def _student_ids(student_ids, source_course_id, usernames, summary, batch_size):
+    """Множина id профілів студентів з усіх джерел, запитами пакетами."""
+    found = set()
+    for batch in batched(set(student_ids), batch_size):
+        students = set(Profile.objects.filter(id__in=batch, role='student').values_list('id', flat=True))
+        found.update(students)
+        summary.skipped.extend(sorted(set(batch) - students))
+    if source_course_id is not None:
+        found.update(Enrollment.objects.filter(course_id=source_course_id).values_list('student_id', flat=True))
+    for batch in batched(set(usernames), batch_size):
+        profiles = dict(
+            Profile.objects.filter(user__username__in=batch, role='student')
+            .values_list('user__username', 'id')
+        )
+        found.update(profiles.values())
+        summary.unknown.extend(sorted(set(batch) - profiles.keys()))
+    return found
+
+
+def _enrolled_ids(course, student_ids):
+    return set(
+        Enrollment.objects.filter(course=course, student_id__in=student_ids).values_list('student_id', flat=True)
+    )
+
+
+def _enroll_new(course, student_ids):
+    """
+    Записує на курс тих із student_ids, кого там ще немає; повертає (додані, вже записані).
+
+    Вставка без ignore_conflicts: якщо студента записали паралельно між перевіркою і вставкою,
+    пакет відкочується до точки збереження і перевіряється знову, тому в доданих лише ті
+    записи, які створив цей виклик.
+    """
+    for attempt in range(ENROLL_ATTEMPTS):
+        enrolled = _enrolled_ids(course, student_ids)
+        new_ids = sorted(set(student_ids) - enrolled)
+        if not new_ids:
+            return [], sorted(enrolled)
+        try:
+            with transaction.atomic():
+                Enrollment.objects.bulk_create(
+                    [Enrollment(course=course, student_id=student_id) for student_id in new_ids]
+                )
+        except IntegrityError:
+            if attempt == ENROLL_ATTEMPTS - 1:
+                raise
+            continue
+        return new_ids, sorted(enrolled)
+
+
+def enroll_students(course, student_ids=(), source_course_id=None, usernames=(), batch_size=ENROLL_BATCH_SIZE):
+    """
+    Записує на курс обраних студентів, список курсу source_course_id і студентів за іменами.
+
+    Id визначаються запитами на множини, вже записані студенти пропускаються, а нові
+    вставляються пакетами через bulk_create в одній транзакції.
+    """
+    summary = EnrollmentSummary()
+    with transaction.atomic():
+        candidates = _student_ids(student_ids, source_course_id, usernames, summary, batch_size)
+        for batch in batched(sorted(candidates), batch_size):
+            added, skipped = _enroll_new(course, batch)
+            summary.added.extend(added)
+            summary.skipped.extend(skipped)
+
+        if summary.added:
+            # bulk_create не надсилає сигналів, тому кеш скидаємо тут, після фіксації транзакції
+            after_enrollments_change(course.id, summary.added)
+    return summary
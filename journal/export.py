@@ -0,0 +1,243 @@
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from django.utils import translation
+from django.utils.translation import get_language, gettext as _
+
+from .gradebook import course_lessons
+from .models import Enrollment, Grade
+
+# Розмір пакета рядків, які отримуються з бази за один раз
+CHUNK_SIZE = 2000
+# Накопичені байти XLSX віддаються клієнту, коли їх більше за цей розмір
+XLSX_FLUSH_BYTES = 64 * 1024
+
+STUDENT_ORDER = ('student__user__last_name', 'student__user__first_name', 'student_id')
+
+
+def gradebook_rows(course, language):
+    """
+    Рядки журналу курсу: заголовок з назвами занять мовою language, далі студент і його оцінки.
+
+    Записи на курс і оцінки читаються через .iterator() в однаковому порядку
+    студентів і зливаються потоково, тому в пам'яті тримаються лише заняття.
+    """
+    # Генератор виконується вже після виходу з представлення, тому мову активуємо явно
+    with translation.override(language):
+        lessons = list(course_lessons(course))
+        header = [_('Student'), _('Username')] + [lesson.title for lesson in lessons]
+    columns = {lesson.id: index for index, lesson in enumerate(lessons)}
+    yield header
+
+    enrollments = (
+        Enrollment.objects.filter(course=course)
+        .order_by(*STUDENT_ORDER)
+        .values_list('student_id', 'student__user__username',
+                     'student__user__first_name', 'student__user__last_name')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    grades = (
+        Grade.objects.filter(
+            lesson__course=course,
+            student__in=Enrollment.objects.filter(course=course).values('student_id'),
+        )
+        .order_by(*STUDENT_ORDER)
+        .values_list('student_id', 'lesson_id', 'grade')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    pending = next(grades, None)
+    for student_id, username, first_name, last_name in enrollments:
+        row = [None] * len(lessons)
+        while pending is not None and pending[0] == student_id:
+            index = columns.get(pending[1])
+            if index is not None:
+                row[index] = pending[2]
+            pending = next(grades, None)
+        yield [f'{first_name} {last_name}'.strip(), username] + row
+
+
+# Початкові символи, з якими Excel виконує клітинку як формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Апостроф змушує Excel показати значення як текст
+        return f"'{value}"
+    return value
+
+
+class _Echo:
+    """Об'єкт з методом write, що повертає записаний рядок, для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(sections):
+    """
+    CSV для послідовності (назва, рядки).
+
+    Якщо секцій кілька, перед кожною виводиться рядок з назвою, а між ними - порожній рядок.
+    """
+    writer = csv.writer(_Echo())
+    # BOM, щоб Excel правильно визначив кодування UTF-8
+    yield '\ufeff'
+    sections = list(sections)
+    for number, (title, rows) in enumerate(sections):
+        if len(sections) > 1:
+            if number:
+                yield writer.writerow([])
+            yield writer.writerow([_csv_cell(title)])
+        for row in rows:
+            yield writer.writerow([_csv_cell(value) for value in row])
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Буфер без seek для zipfile, з якого записані байти забираються частинами."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>'
+)
+XLSX_SHEET_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}</Relationships>'
+)
+XLSX_SHEET_REL = (
+    '<Relationship Id="rId{index}" Target="worksheets/sheet{index}.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+)
+XLSX_SHEET_START = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_SHEET_END = b'</sheetData></worksheet>'
+# Символи, заборонені в назвах аркушів Excel
+SHEET_NAME_RE = re.compile(r'[\[\]:*?/\\]')
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _sheet_names(titles):
+    """Унікальні назви аркушів до 31 символу без заборонених символів."""
+    names = []
+    for index, title in enumerate(titles, 1):
+        name = SHEET_NAME_RE.sub(' ', title)[:31].strip() or f'Sheet{index}'
+        if name.lower() in (existing.lower() for existing in names):
+            suffix = f' ({index})'
+            name = name[:31 - len(suffix)] + suffix
+        names.append(name)
+    return names
+
+
+def stream_xlsx(sections):
+    """
+    Книга XLSX для послідовності (назва, рядки), по аркушу на секцію, частинами байтів.
+
+    Аркуші записуються у zip-архів рядок за рядком з inline-рядками замість таблиці
+    спільних рядків, тому весь файл ніколи не тримається в пам'яті.
+    """
+    buffer = _StreamBuffer()
+    titles = []
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index, (title, rows) in enumerate(sections, 1):
+            titles.append(title)
+            with archive.open(f'xl/worksheets/sheet{index}.xml', 'w') as sheet:
+                sheet.write(XLSX_SHEET_START)
+                for row in rows:
+                    sheet.write(f"<row>{''.join(map(_xlsx_cell, row))}</row>".encode())
+                    if buffer.size >= XLSX_FLUSH_BYTES:
+                        yield buffer.drain()
+                sheet.write(XLSX_SHEET_END)
+            yield buffer.drain()
+        if not titles:
+            # Книга без аркушів не відкривається, тому додається порожній аркуш
+            titles.append('')
+            archive.writestr('xl/worksheets/sheet1.xml', XLSX_SHEET_START + XLSX_SHEET_END)
+
+        indexes = range(1, len(titles) + 1)
+        archive.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES.format(
+            sheets=''.join(XLSX_SHEET_TYPE.format(index=index) for index in indexes)
+        ))
+        archive.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(sheets=''.join(
+            f'<sheet name={quoteattr(name)} sheetId="{index}" r:id="rId{index}"/>'
+            for index, name in zip(indexes, _sheet_names(titles))
+        )))
+        archive.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS.format(
+            sheets=''.join(XLSX_SHEET_REL.format(index=index) for index in indexes)
+        ))
+    yield buffer.drain()
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def course_sections(courses):
+    """Секції експорту (назва курсу, рядки журналу) активною зараз мовою."""
+    return _course_sections(courses, get_language())
+
+
+def _course_sections(courses, language):
+    with translation.override(language):
+        courses = list(courses)
+    for course in courses:
+        # Журнал курсу читається з бази лише тоді, коли до нього доходить запис
+        yield course.title, gradebook_rows(course, language)
@@ -1,9 +1,14 @@
 # Оптимізовані імпорти
+import re
+
 from django import forms
+from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
-from .models import Course, Lesson, Grade, Profile, Enrollment
+from .caching import course_student_ids
+from .gradebook import clean_grade, existing_grades
+from .models import Course, Lesson, Grade, Profile
 from parler.forms import TranslatableModelForm
 
 # Форма для реєстрації учня або викладача
@@ -47,18 +52,133 @@ class GradeForm(forms.ModelForm):
             'student': forms.HiddenInput(),
         }
 
+    def validate_unique(self):
+        # Існуюча оцінка оновлюється через upsert, тому дублікат пари не є помилкою
+        pass
+
+# Форма для масового редагування журналу оцінок курсу
+class GradebookForm(forms.Form):
+    """
+    Комірки журналу приходять як поля grade-<student_id>-<lesson_id>.
+
+    Порожні комірки ігноруються, помилки збираються для кожної комірки окремо
+    в cell_errors {student_id: {lesson_id: повідомлення}}. Перевіряються й читаються
+    лише надіслані комірки, а не весь журнал курсу.
+    """
+    CELL_RE = re.compile(r'grade-(\d+)-(\d+)')
+
+    def __init__(self, *args, course_id=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.course_id = course_id
+        self.cells = {}
+        self.cell_errors = {}
+
+    def add_cell_error(self, student_id, lesson_id, message):
+        self.cell_errors.setdefault(student_id, {})[lesson_id] = message
+
+    def posted_cells(self):
+        """Непорожні комірки форми {(student_id, lesson_id): значення}."""
+        cells = {}
+        for key, raw_value in self.data.items():
+            match = self.CELL_RE.fullmatch(key)
+            if match and raw_value.strip():
+                cells[(int(match.group(1)), int(match.group(2)))] = raw_value.strip()
+        return cells
+
+    def clean(self):
+        cleaned_data = super().clean()
+        posted = self.posted_cells()
+        student_ids = course_student_ids(self.course_id) if posted else frozenset()
+        lesson_ids = set(
+            Lesson.objects.filter(course_id=self.course_id, id__in={lesson_id for _, lesson_id in posted})
+            .values_list('id', flat=True)
+        ) if posted else set()
+
+        values = {}
+        for (student_id, lesson_id), raw_value in posted.items():
+            if student_id not in student_ids or lesson_id not in lesson_ids:
+                self.add_cell_error(student_id, lesson_id, _('Unknown student or lesson.'))
+                continue
+            try:
+                values[(student_id, lesson_id)] = clean_grade(raw_value)
+            except ValidationError as error:
+                self.add_cell_error(student_id, lesson_id, ' '.join(error.messages))
+
+        if self.cell_errors:
+            raise ValidationError(_('Some grades are invalid.'))
+        # Незмінені оцінки не записуються
+        current_grades = existing_grades(values)
+        self.cells = {cell: value for cell, value in values.items() if current_grades.get(cell) != value}
+        return cleaned_data
+
 # Форма для додавання студента до курсу
 class AddStudentForm(forms.Form):
-    student = forms.ModelChoiceField(queryset=Profile.objects.filter(role='student'))
+    """
+    Студент обирається пошуком (student_search), тому форма не перелічує всіх студентів:
+    перевіряється лише обраний id.
+    """
+    student = forms.ModelChoiceField(
+        queryset=Profile.objects.filter(role='student').select_related('user'),
+        widget=forms.HiddenInput,
+    )
 
     def __init__(self, *args, **kwargs):
-        course_id = kwargs.pop('course_id', None)
+        self.course_id = kwargs.pop('course_id', None)
         super().__init__(*args, **kwargs)
-        
-        if course_id:
-            # Виключити студентів, які вже записані на цей курс
-            enrolled_students = Enrollment.objects.filter(course_id=course_id).values_list('student_id', flat=True)
-            self.fields['student'].queryset = Profile.objects.filter(role='student').exclude(id__in=enrolled_students)
+
+    def clean_student(self):
+        student = self.cleaned_data['student']
+        if self.course_id and student.id in course_student_ids(self.course_id):
+            raise ValidationError(_('This student is already enrolled in the course.'))
+        return student
+
+# Форма для масового запису студентів на курс
+class BulkEnrollForm(forms.Form):
+    """Обрані пошуком студенти, усі студенти іншого курсу викладача та/або список імен."""
+    SEPARATORS_RE = re.compile(r'[\s,;]+')
+
+    # id обраних студентів через кому, заповнюється вибором студентів на сторінці
+    students = forms.CharField(required=False, widget=forms.HiddenInput)
+    source_course = forms.TypedChoiceField(
+        label=_('Усі студенти курсу'), coerce=int, empty_value=None, required=False,
+    )
+    usernames = forms.CharField(
+        label=_('Імена користувачів'), required=False,
+        widget=forms.Textarea(attrs={'rows': 6, 'class': 'form-control'}),
+        help_text=_('Через кому, пробіл або з нового рядка.'),
+    )
+
+    def __init__(self, *args, source_courses=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['source_course'].choices = [('', '---------')] + [
+            (course['id'], course['title']) for course in source_courses
+        ]
+
+    def clean_students(self):
+        ids = [part for part in self.SEPARATORS_RE.split(self.cleaned_data['students']) if part]
+        if not all(part.isdigit() for part in ids):
+            raise ValidationError(_('Invalid student selection.'))
+        return [int(part) for part in ids]
+
+    def clean_usernames(self):
+        return [name for name in self.SEPARATORS_RE.split(self.cleaned_data['usernames']) if name]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors and not any(cleaned_data.get(field) for field in self.fields):
+            raise ValidationError(_('Choose students, a course or enter usernames.'))
+        return cleaned_data
+
+# Форма для імпорту записів на курс або оцінок з CSV
+class ImportForm(forms.Form):
+    KIND_CHOICES = [
+        ('enrollments', _('Записи на курс (username)')),
+        ('grades', _('Оцінки (username, id заняття, оцінка)')),
+    ]
+
+    kind = forms.ChoiceField(label=_('Що імпортувати'), choices=KIND_CHOICES)
+    file = forms.FileField(label=_('CSV-файл'))
+    dry_run = forms.BooleanField(label=_('Лише перевірити, без збереження'), required=False, initial=True)
 
 # Форма для оновлення даних користувача
 class UserUpdateForm(forms.ModelForm):
@@ -0,0 +1,439 @@
+import asyncio
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache, reduce
+from operator import or_
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, DateTimeField, Q, TextField
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.translation import get_language
+
+from .caching import (
+    GRADEBOOK_TIMEOUT,
+    after_commit,
+    bump_course_version,
+    gradebook_cache_key,
+    record_gradebook_cache,
+)
+from .models import Enrollment, Grade, Lesson
+from .utils import batched
+
+GRADE_FIELD = Grade._meta.get_field('grade')
+# Скільки занять перевіряється одним запитом наявних оцінок
+EXISTING_GRADES_LESSONS = 100
+
+
+def course_lessons(course):
+    """Заняття курсу з перекладами, впорядковані за розкладом."""
+    return (
+        Lesson.objects.filter(course=course)
+        .with_translations()
+        .order_by('schedule', 'id')
+    )
+
+
+def course_enrollments(course):
+    """Записи на курс разом зі студентами та їх користувачами."""
+    return (
+        Enrollment.objects.filter(course=course)
+        .select_related('student__user')
+        .order_by('student__user__last_name', 'student__user__first_name', 'id')
+    )
+
+
+def grade_matrix(course, student_ids, lesson_ids):
+    """
+    Матриця оцінок курсу {student_id: {lesson_id: оцінка}} за один запит.
+
+    Для кожного студента повертається словник по всіх заняттях, відсутні
+    оцінки мають значення None.
+    """
+    matrix = {
+        student_id: dict.fromkeys(lesson_ids)
+        for student_id in student_ids
+    }
+    rows = (
+        Grade.objects.filter(lesson__course=course)
+        .values_list('student_id', 'lesson_id', 'grade')
+    )
+    for student_id, lesson_id, value in rows:
+        row = matrix.get(student_id)
+        if row is not None and lesson_id in row:
+            row[lesson_id] = value
+    return matrix
+
+
+def existing_grades(cells, chunk_size=EXISTING_GRADES_LESSONS):
+    """
+    Наявні оцінки лише для клітинок cells {(student_id, lesson_id): ...}.
+
+    Умова будується по заняттях: (lesson_id = l AND student_id IN студенти клітинок l) OR ...,
+    тому запит не читає решту журналу, як читав би добуток student_id IN x lesson_id IN.
+    """
+    students_by_lesson = defaultdict(set)
+    for student_id, lesson_id in cells:
+        students_by_lesson[lesson_id].add(student_id)
+    existing = {}
+    for lessons in batched(students_by_lesson.items(), chunk_size):
+        condition = reduce(or_, (
+            Q(lesson_id=lesson_id, student_id__in=student_ids) for lesson_id, student_ids in lessons
+        ))
+        existing.update(
+            ((student_id, lesson_id), grade)
+            for student_id, lesson_id, grade in
+            Grade.objects.filter(condition).values_list('student_id', 'lesson_id', 'grade')
+        )
+    return existing
+
+
+def lesson_data(lesson):
+    return {
+        'id': lesson.id,
+        'title': lesson.title,
+        'description': lesson.description,
+        'schedule': lesson.schedule,
+    }
+
+
+def enrollment_data(enrollment):
+    user = enrollment.student.user
+    return {
+        'id': enrollment.id,
+        'student': {
+            'id': enrollment.student_id,
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+            },
+        },
+    }
+
+
+def load_gradebook(course):
+    """
+    Заняття, записи та матриця оцінок курсу за фіксовану кількість запитів.
+
+    Дані складаються лише зі словників і простих значень, тому їх можна кешувати.
+    """
+    lessons = [lesson_data(lesson) for lesson in course_lessons(course)]
+    enrollments = [enrollment_data(enrollment) for enrollment in course_enrollments(course)]
+    grades = grade_matrix(
+        course,
+        [enrollment['student']['id'] for enrollment in enrollments],
+        [lesson['id'] for lesson in lessons],
+    )
+    return {
+        'lessons': lessons,
+        'enrollments': enrollments,
+        'students': [enrollment['student'] for enrollment in enrollments],
+        'grades': grades,
+    }
+
+
+def cached_gradebook(course):
+    """
+    Дані журналу курсу з кешу.
+
+    Ключ містить версію курсу, яку збільшують сигнали та функції запису оцінок,
+    тому після будь-якої зміни використовується новий ключ.
+    """
+    key = gradebook_cache_key(course.id, get_language())
+    gradebook = cache.get(key)
+    if gradebook is None:
+        record_gradebook_cache(hit=False)
+        gradebook = load_gradebook(course)
+        cache.set(key, gradebook, GRADEBOOK_TIMEOUT)
+    else:
+        record_gradebook_cache(hit=True)
+    return gradebook
+
+
+# Розмір вікна журналу: кількість студентів (рядків) і занять (стовпців) на сторінці
+STUDENT_WINDOW = 50
+LESSON_WINDOW = 20
+# Поля, за якими впорядковані і розбиваються на сторінки заняття та записи на курс
+LESSON_KEYSET = ('schedule', 'id')
+STUDENT_KEYSET = ('student__user__last_name', 'student__user__first_name', 'id')
+
+
+def encode_cursor(values):
+    # Дати записуються повністю: DjangoJSONEncoder відкинув би мікросекунди
+    return urlsafe_base64_encode(json.dumps(values, default=lambda value: value.isoformat()).encode())
+
+
+def _key_int(value):
+    # bool у JSON теж є int, але ключем бути не може
+    if type(value) is not int:
+        raise TypeError(value)
+    return value
+
+
+def _key_str(value):
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return value
+
+
+def _key_datetime(value):
+    value = datetime.fromisoformat(_key_str(value))
+    if settings.USE_TZ and timezone.is_naive(value):
+        raise ValueError(value)
+    return value
+
+
+@lru_cache
+def key_parsers(model, fields):
+    """Функції перевірки компонент ключа fields моделі model: дата, рядок чи ціле число."""
+    parsers = []
+    for path in fields:
+        *relations, name = path.split('__')
+        target = model
+        for relation in relations:
+            target = target._meta.get_field(relation).related_model
+        field = target._meta.get_field(name)
+        if isinstance(field, DateTimeField):
+            parsers.append(_key_datetime)
+        elif isinstance(field, (CharField, TextField)):
+            parsers.append(_key_str)
+        else:
+            parsers.append(_key_int)
+    return tuple(parsers)
+
+
+def decode_cursor(token, parsers):
+    """
+    Значення ключа з курсора або None, якщо курсор відсутній чи пошкоджений.
+
+    Кожна компонента перевіряється відповідною функцією з parsers (key_parsers), тому
+    змінений вручну курсор не доходить до запиту і вважається відсутнім.
+    """
+    if not token:
+        return None
+    try:
+        values = json.loads(urlsafe_base64_decode(token))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(parsers):
+        return None
+    try:
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (TypeError, ValueError):
+        return None
+
+
+def _keyset_filter(fields, values, backwards):
+    """Умова "рядок після (або перед) ключем values" для впорядкування за fields."""
+    lookup = 'lt' if backwards else 'gt'
+    condition = Q()
+    for index, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[index]})
+        for previous, value in zip(fields[:index], values):
+            step &= Q(**{previous: value})
+        condition |= step
+    return condition
+
+
+def _key(obj, fields):
+    return [reduce(getattr, field.split('__'), obj) for field in fields]
+
+
+def _keyset_query(queryset, fields, size, after, before):
+    """Запит вікна keyset_window та стан (ключ курсора, напрямок) для _keyset_page."""
+    parsers = key_parsers(queryset.model, tuple(fields))
+    backwards = decode_cursor(before, parsers)
+    values = backwards or decode_cursor(after, parsers)
+    backwards = backwards is not None
+    if values is not None:
+        queryset = queryset.filter(_keyset_filter(fields, values, backwards))
+    ordering = [f'-{field}' for field in fields] if backwards else list(fields)
+    return queryset.order_by(*ordering)[:size + 1], (values, backwards)
+
+
+def _keyset_page(rows, fields, size, state):
+    values, backwards = state
+    more = len(rows) > size
+    rows = rows[:size]
+    if backwards:
+        rows.reverse()
+    # В напрямку, звідки прийшов курсор, рядки є (принаймні рядок курсора)
+    has_previous = more if backwards else values is not None
+    has_next = values is not None if backwards else more
+    return (
+        rows,
+        encode_cursor(_key(rows[0], fields)) if rows and has_previous else None,
+        encode_cursor(_key(rows[-1], fields)) if rows and has_next else None,
+    )
+
+
+def keyset_window(queryset, fields, size, after=None, before=None):
+    """
+    Не більше size рядків queryset, впорядкованого за fields, після курсора after
+    або перед курсором before.
+
+    Вікно прив'язане до ключа рядка, а не до зсуву, тому додані чи видалені рядки
+    не зсувають його. Повертає (рядки, курсор попереднього вікна, курсор наступного),
+    курсори None, якщо в тому напрямку рядків немає.
+    """
+    query, state = _keyset_query(queryset, fields, size, after, before)
+    return _keyset_page(list(query), fields, size, state)
+
+
+async def akeyset_window(queryset, fields, size, after=None, before=None):
+    """Асинхронна версія keyset_window."""
+    query, state = _keyset_query(queryset, fields, size, after, before)
+    return _keyset_page([row async for row in query], fields, size, state)
+
+
+def _window_grades(student_ids, lesson_ids):
+    """Запит оцінок на перетині вікна студентів і занять."""
+    return (
+        Grade.objects.filter(student_id__in=student_ids, lesson_id__in=lesson_ids)
+        .values_list('student_id', 'lesson_id', 'grade')
+    )
+
+
+def _gradebook_window_data(lesson_window, enrollment_window, grade_rows):
+    lesson_rows, lessons_previous, lessons_next = lesson_window
+    enrollment_rows, students_previous, students_next = enrollment_window
+    lessons = [lesson_data(lesson) for lesson in lesson_rows]
+    enrollments = [enrollment_data(enrollment) for enrollment in enrollment_rows]
+    lesson_ids = [lesson['id'] for lesson in lessons]
+
+    grades = {enrollment['student']['id']: dict.fromkeys(lesson_ids) for enrollment in enrollments}
+    for student_id, lesson_id, value in grade_rows:
+        grades[student_id][lesson_id] = value
+
+    return {
+        'lessons': lessons,
+        'enrollments': enrollments,
+        'students': [enrollment['student'] for enrollment in enrollments],
+        'grades': grades,
+        'pages': {
+            'students': {'previous': students_previous, 'next': students_next},
+            'lessons': {'previous': lessons_previous, 'next': lessons_next},
+        },
+    }
+
+
+def load_gradebook_window(course, students=(None, None), lessons=(None, None),
+                          student_size=STUDENT_WINDOW, lesson_size=LESSON_WINDOW):
+    """
+    Вікно журналу: частина студентів і занять курсу та оцінки лише на їх перетині.
+
+    students і lessons - пари курсорів (after, before). Кількість запитів і обсяг
+    даних залежать від розміру вікна, а не від розміру курсу.
+    """
+    lesson_window = keyset_window(course_lessons(course), LESSON_KEYSET, lesson_size, *lessons)
+    enrollment_window = keyset_window(course_enrollments(course), STUDENT_KEYSET, student_size, *students)
+    student_ids = [enrollment.student_id for enrollment in enrollment_window[0]]
+    lesson_ids = [lesson.id for lesson in lesson_window[0]]
+    grade_rows = list(_window_grades(student_ids, lesson_ids)) if student_ids and lesson_ids else []
+    return _gradebook_window_data(lesson_window, enrollment_window, grade_rows)
+
+
+async def aload_gradebook_window(course, students=(None, None), lessons=(None, None),
+                                 student_size=STUDENT_WINDOW, lesson_size=LESSON_WINDOW):
+    """
+    Асинхронна версія load_gradebook_window.
+
+    Вікна занять і студентів незалежні, тому запитуються одночасно; оцінки - після них.
+    """
+    lesson_window, enrollment_window = await asyncio.gather(
+        akeyset_window(course_lessons(course), LESSON_KEYSET, lesson_size, *lessons),
+        akeyset_window(course_enrollments(course), STUDENT_KEYSET, student_size, *students),
+    )
+    student_ids = [enrollment.student_id for enrollment in enrollment_window[0]]
+    lesson_ids = [lesson.id for lesson in lesson_window[0]]
+    grade_rows = [
+        row async for row in _window_grades(student_ids, lesson_ids)
+    ] if student_ids and lesson_ids else []
+    return _gradebook_window_data(lesson_window, enrollment_window, grade_rows)
+
+
+def _window_cache_key(course, students, lessons):
+    """
+    Ключ кешу вікна з розкодованих курсорів.
+
+    Пошкоджені курсори вважаються відсутніми, як і в keyset_window, тому довільні
+    рядки з адреси не створюють нових записів кешу; хеш тримає ключ короткою
+    і без пробілів, як вимагає Memcached.
+    """
+    student_parsers = key_parsers(Enrollment, STUDENT_KEYSET)
+    lesson_parsers = key_parsers(Lesson, LESSON_KEYSET)
+    window = [decode_cursor(token, student_parsers) for token in students]
+    window += [decode_cursor(token, lesson_parsers) for token in lessons]
+    digest = hashlib.sha1(json.dumps(window, default=lambda value: value.isoformat()).encode()).hexdigest()
+    return f'{gradebook_cache_key(course.id, get_language())}:{digest}'
+
+
+def cached_gradebook_window(course, students=(None, None), lessons=(None, None)):
+    """Вікно журналу з кешу; ключ доповнюється курсорами вікна."""
+    key = _window_cache_key(course, students, lessons)
+    gradebook = cache.get(key)
+    if gradebook is None:
+        record_gradebook_cache(hit=False)
+        gradebook = load_gradebook_window(course, students, lessons)
+        cache.set(key, gradebook, GRADEBOOK_TIMEOUT)
+    else:
+        record_gradebook_cache(hit=True)
+    return gradebook
+
+
+async def acached_gradebook_window(course, students=(None, None), lessons=(None, None)):
+    """Асинхронна версія cached_gradebook_window."""
+    key = await sync_to_async(_window_cache_key)(course, students, lessons)
+    gradebook = await cache.aget(key)
+    if gradebook is None:
+        await sync_to_async(record_gradebook_cache)(hit=False)
+        gradebook = await aload_gradebook_window(course, students, lessons)
+        await cache.aset(key, gradebook, GRADEBOOK_TIMEOUT)
+    else:
+        await sync_to_async(record_gradebook_cache)(hit=True)
+    return gradebook
+
+
+def clean_grade(value):
+    """Перетворює значення на число і перевіряє валідатори поля Grade.grade (0-100)."""
+    return GRADE_FIELD.clean(value, None)
+
+
+def save_grade(course_id, lesson_id, student_id, value):
+    """Створює або оновлює оцінку одним запитом INSERT ... ON CONFLICT DO UPDATE."""
+    Grade.objects.bulk_create(
+        [Grade(lesson_id=lesson_id, student_id=student_id, grade=value)],
+        update_conflicts=True,
+        unique_fields=['lesson', 'student'],
+        update_fields=['grade'],
+    )
+    # bulk_create не надсилає сигналів, тому версію курсу збільшуємо тут
+    after_commit(bump_course_version, course_id)
+
+
+def save_grades(course_id, cells, batch_size=500):
+    """
+    Зберігає багато оцінок {(student_id, lesson_id): оцінка} в одній транзакції.
+
+    Записи вставляються пакетами по batch_size через INSERT ... ON CONFLICT DO UPDATE.
+    """
+    with transaction.atomic():
+        Grade.objects.bulk_create(
+            [
+                Grade(lesson_id=lesson_id, student_id=student_id, grade=value)
+                for (student_id, lesson_id), value in cells.items()
+            ],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['lesson', 'student'],
+            update_fields=['grade'],
+        )
+        after_commit(bump_course_version, course_id)
+    return len(cells)
@@ -0,0 +1,199 @@
+import codecs
+import csv
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from .caching import after_enrollments_change
+from .gradebook import clean_grade, existing_grades, save_grades
+from .models import Enrollment, Lesson
+from .utils import batched
+
+# Кількість рядків файлу, що обробляються (і записуються) разом
+IMPORT_BATCH_SIZE = 2000
+
+
+class ImportReport:
+    """
+    Підсумок імпорту: кількість рядків, створених/оновлених/пропущених записів і помилки.
+
+    Кожен пакет записується в окремій транзакції. Якщо файл не вдалося дочитати,
+    failure містить причину, а committed - кількість рядків уже збережених пакетів.
+    """
+
+    MAX_ERRORS = 50
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.counts = Counter()
+        self.errors = []  # Лише перші MAX_ERRORS помилок (номер рядка, повідомлення)
+        self.error_count = 0
+        self.committed = 0
+        self.failure = None
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def csv_rows(file):
+    """
+    Пари (номер рядка, поля) з CSV-файлу, який читається потоково.
+
+    Порожні рядки та заголовок (перше поле "username") пропускаються.
+    """
+    reader = csv.reader(codecs.iterdecode(file, 'utf-8-sig'))
+    for row in reader:
+        row = [field.strip() for field in row]
+        if not any(row):
+            continue
+        if reader.line_num == 1 and row[0].lower() == 'username':
+            continue
+        yield reader.line_num, row
+
+
+def _batches(report, file, batch_size):
+    """Пакети рядків файлу; помилка читання зупиняє імпорт і записується у звіт."""
+    batches = batched(csv_rows(file), batch_size)
+    while True:
+        try:
+            batch = next(batches)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as error:
+            report.failure = _('Could not read the CSV file: %(error)s') % {'error': error}
+            return
+        yield batch
+
+
+def _profiles(usernames):
+    """{username: (profile_id, role)} для набору імен одним запитом."""
+    return {
+        username: (profile_id, role)
+        for username, profile_id, role in User.objects.filter(
+            username__in=set(usernames), profile__isnull=False,
+        ).values_list('username', 'profile__id', 'profile__role')
+    }
+
+
+def _student_id(report, line, profiles, username):
+    """id профілю студента за іменем або None з помилкою у звіті."""
+    profile = profiles.get(username)
+    if profile is None:
+        report.error(line, _('Unknown user "%(username)s".') % {'username': username})
+        return None
+    profile_id, role = profile
+    if role != 'student':
+        report.error(line, _('User "%(username)s" is not a student.') % {'username': username})
+        return None
+    return profile_id
+
+
+def import_enrollments(course, file, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Записує на курс студентів з CSV (username в першому стовпці).
+
+    Імена перевіряються одним запитом на пакет, записи створюються пакетами через
+    bulk_create(ignore_conflicts=True), кожен пакет в окремій транзакції, щоб не
+    тримати блокування запису SQLite на весь файл.
+    """
+    report = ImportReport(dry_run)
+    enrolled = set(Enrollment.objects.filter(course=course).values_list('student_id', flat=True))
+
+    for batch in _batches(report, file, batch_size):
+        profiles = _profiles(row[0] for _, row in batch)
+        new_ids = []
+        for line, row in batch:
+            report.rows += 1
+            student_id = _student_id(report, line, profiles, row[0])
+            if student_id is None:
+                continue
+            if student_id in enrolled:
+                report.counts['skipped'] += 1
+                continue
+            enrolled.add(student_id)
+            new_ids.append(student_id)
+
+        report.counts['created'] += len(new_ids)
+        if dry_run:
+            continue
+        if new_ids:
+            with transaction.atomic():
+                Enrollment.objects.bulk_create(
+                    [Enrollment(course=course, student_id=student_id) for student_id in new_ids],
+                    ignore_conflicts=True,
+                )
+                # bulk_create не надсилає сигналів, тому кеш скидаємо тут, після фіксації пакета
+                after_enrollments_change(course.id, new_ids)
+        report.committed = report.rows
+    return report
+
+
+def import_grades(course, file, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Імпортує оцінки з CSV (username, id заняття, оцінка).
+
+    Заняття і записи курсу завантажуються один раз як множини, імена студентів
+    і наявні оцінки імпортованих клітинок - запитами на пакет. Записуються лише нові
+    та змінені оцінки через INSERT ... ON CONFLICT DO UPDATE, по одній транзакції
+    на пакет; при повторі клітинки діє останнє значення.
+    """
+    report = ImportReport(dry_run)
+    lesson_ids = set(Lesson.objects.filter(course=course).values_list('id', flat=True))
+    enrolled = set(Enrollment.objects.filter(course=course).values_list('student_id', flat=True))
+    # При перевірці без збереження попередні пакети не записані в базу, тому повтор
+    # клітинки в наступному пакеті порівнюється з цими значеннями
+    pending = {}
+
+    for batch in _batches(report, file, batch_size):
+        profiles = _profiles(row[0] for _, row in batch)
+        cells = {}
+        for line, row in batch:
+            report.rows += 1
+            if len(row) < 3:
+                report.error(line, _('Expected username, lesson and grade.'))
+                continue
+            username, lesson, value = row[:3]
+            student_id = _student_id(report, line, profiles, username)
+            if student_id is None:
+                continue
+            if student_id not in enrolled:
+                report.error(line, _('User "%(username)s" is not enrolled in this course.') % {'username': username})
+                continue
+            # Лише заняття цього курсу, тому й наявні оцінки читаються тільки з нього
+            if not lesson.isdigit() or int(lesson) not in lesson_ids:
+                report.error(line, _('Unknown lesson "%(lesson)s".') % {'lesson': lesson})
+                continue
+            try:
+                cells[(student_id, int(lesson))] = clean_grade(value)
+            except ValidationError as error:
+                report.error(line, ' '.join(error.messages))
+
+        existing = existing_grades(cells)
+        changed = {}
+        for key, grade in cells.items():
+            previous = pending.get(key, existing.get(key))
+            if previous == grade:
+                report.counts['unchanged'] += 1
+                continue
+            report.counts['created' if previous is None else 'updated'] += 1
+            changed[key] = grade
+
+        if dry_run:
+            pending.update(changed)
+            continue
+        if changed:
+            save_grades(course.id, changed, batch_size=batch_size)
+        report.committed = report.rows
+    return report
+
+
+IMPORTERS = {
+    'enrollments': import_enrollments,
+    'grades': import_grades,
+}
@@ -0,0 +1,71 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.benchmarks import (
+    DATASETS,
+    benchmark_database,
+    compare,
+    load_report,
+    run_suite,
+    save_report,
+)
+
+
+class Command(BaseCommand):
+    help = 'Вимірює час, кількість запитів і пам\'ять основних представлень та порівнює з базовими.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=sorted(DATASETS), default='small')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--only', default='', help='Назви сценаріїв через кому.')
+        parser.add_argument('--output', help='Файл JSON для збереження результатів.')
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline-{dataset}.json'),
+            help='Файл JSON з базовими результатами.',
+        )
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Допустиме погіршення (частка).')
+        parser.add_argument(
+            '--compare-timings',
+            action='store_true',
+            help='Порівнювати також час і пам\'ять (лише з базовими результатами, записаними на цій машині).',
+        )
+        parser.add_argument('--update-baseline', action='store_true', help='Записати результати як базові.')
+
+    def handle(self, *args, **options):
+        only = [name for name in options['only'].split(',') if name]
+        with benchmark_database():
+            report = run_suite(options['dataset'], repeat=options['repeat'], only=only)
+
+        self.stdout.write(f"dataset {report['dataset']}: {report['counts']} (seeded in {report['seed_seconds']}s)")
+        self.stdout.write(f"{'scenario':<24} {'median ms':>10} {'max ms':>10} {'queries':>8} {'peak KB':>10}")
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f"{name:<24} {result['median_ms']:>10.2f} {result['max_ms']:>10.2f} "
+                f"{result['queries']:>8} {result['peak_kb']:>10.1f}"
+            )
+
+        if options['output']:
+            save_report(report, options['output'])
+
+        baseline_path = options['baseline'].format(dataset=options['dataset'])
+        if options['update_baseline']:
+            os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+            save_report(report, baseline_path)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+
+        if not os.path.exists(baseline_path):
+            self.stdout.write(self.style.WARNING(f'No baseline at {baseline_path}, skipping comparison.'))
+            return
+
+        regressions = compare(
+            report, load_report(baseline_path), options['tolerance'], timings=options['compare_timings'],
+        )
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(f'{len(regressions)} performance regression(s) against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from journal.benchmarks import DATASETS, benchmark_database, run_asgi_suite, save_report
+
+
+class Command(BaseCommand):
+    help = 'Порівнює затримку та пропускну здатність синхронних і асинхронних представлень під ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=sorted(DATASETS), default='small')
+        parser.add_argument('--requests', type=int, default=200, help='Кількість запитів на сценарій.')
+        parser.add_argument('--concurrency', type=int, default=10, help='Кількість одночасних запитів.')
+        parser.add_argument('--only', default='', help='Назви сценаріїв через кому.')
+        parser.add_argument('--output', help='Файл JSON для збереження результатів.')
+
+    def handle(self, *args, **options):
+        only = [name for name in options['only'].split(',') if name]
+        with benchmark_database():
+            report = run_asgi_suite(
+                options['dataset'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                only=only,
+            )
+
+        self.stdout.write(
+            f"dataset {report['dataset']}: {report['counts']}, "
+            f"{report['requests']} requests, concurrency {report['concurrency']}"
+        )
+        self.stdout.write(f"{'scenario':<24} {'view':<6} {'median ms':>10} {'p95 ms':>10} {'req/s':>8}")
+        for name, variants in report['results'].items():
+            for variant, result in variants.items():
+                self.stdout.write(
+                    f"{name:<24} {variant:<6} {result['median_ms']:>10.2f} "
+                    f"{result['p95_ms']:>10.2f} {result['requests_per_second']:>8.1f}"
+                )
+
+        if options['output']:
+            save_report(report, options['output'])
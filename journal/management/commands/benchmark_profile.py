@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from journal.benchmarks import benchmark_database, benchmark_profile
+
+
+class Command(BaseCommand):
+    help = 'Вимірює час відображення профілю студента залежно від кількості курсів.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,5,15,30', help='Кількості курсів через кому.')
+        parser.add_argument('--lessons', type=int, default=10, help='Кількість занять у курсі.')
+        parser.add_argument('--repeat', type=int, default=5, help='Кількість повторів на розмір.')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with benchmark_database():
+            results = benchmark_profile(sizes, options['lessons'], options['repeat'])
+
+        self.stdout.write(f"{'courses':>8} {'median ms':>10} {'queries':>8}")
+        for result in results:
+            self.stdout.write(
+                f"{result['enrollments']:>8} {result['median_ms']:>10.2f} {result['queries']:>8}"
+            )
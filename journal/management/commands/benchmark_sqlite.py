@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.benchmarks import DATASETS, run_sqlite_suite, save_report
+
+
+class Command(BaseCommand):
+    help = 'Порівнює пропускну здатність і помилки блокування профілів SQLite під навантаженням кількох процесів.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=sorted(DATASETS), default='small')
+        parser.add_argument('--processes', type=int, default=4, help='Кількість процесів навантаження.')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Тривалість навантаження для профілю.')
+        parser.add_argument('--write-share', type=float, default=0.2, help='Частка операцій запису.')
+        parser.add_argument('--profiles', default='', help='Профілі settings.SQLITE_PROFILES через кому.')
+        parser.add_argument('--output', help='Файл JSON для збереження результатів.')
+
+    def handle(self, *args, **options):
+        profiles = [name for name in options['profiles'].split(',') if name]
+        unknown = set(profiles) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown SQLite profiles: {', '.join(sorted(unknown))}")
+
+        report = run_sqlite_suite(
+            options['dataset'],
+            processes=options['processes'],
+            seconds=options['seconds'],
+            write_share=options['write_share'],
+            profiles=profiles,
+        )
+
+        self.stdout.write(
+            f"dataset {report['dataset']}: {report['counts']}, {report['processes']} processes, "
+            f"{report['seconds']}s, write share {report['write_share']}"
+        )
+        self.stdout.write(
+            f"{'profile':<12} {'journal':<8} {'reads/s':>8} {'writes/s':>9} {'read err':>9} "
+            f"{'write err':>10} {'read p95':>9} {'write p95':>10}"
+        )
+        for profile, result in report['results'].items():
+            self.stdout.write(
+                f"{profile:<12} {result['journal_mode']:<8} {result['reads_per_second']:>8.1f} "
+                f"{result['writes_per_second']:>9.1f} {result['read_errors']:>9} {result['write_errors']:>10} "
+                f"{result['read_p95_ms'] or 0:>9.1f} {result['write_p95_ms'] or 0:>10.1f}"
+            )
+
+        if options['output']:
+            save_report(report, options['output'])
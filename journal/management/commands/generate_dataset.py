@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.datagen import generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Генерує великий синтетичний набір даних (користувачі, курси, заняття, записи, оцінки).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=100)
+        parser.add_argument('--courses', type=int, default=500)
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--lessons-per-course', type=int, default=20)
+        parser.add_argument('--courses-per-student', type=int, default=5)
+        parser.add_argument('--grade-density', type=float, default=0.8, help='Частка занять з оцінкою (0..1).')
+        parser.add_argument(
+            '--languages', default=','.join(code for code, _ in settings.LANGUAGES),
+            help='Мови перекладів через кому.',
+        )
+        parser.add_argument('--prefix', default='gen', help='Префікс імен користувачів.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['teachers'] < 1 or options['courses'] < 1:
+            raise CommandError('At least one teacher and one course are required.')
+        if not 0 <= options['grade_density'] <= 1:
+            raise CommandError('--grade-density must be between 0 and 1.')
+
+        started = time.perf_counter()
+        counts = generate_dataset(
+            teachers=options['teachers'],
+            courses=options['courses'],
+            students=options['students'],
+            lessons_per_course=options['lessons_per_course'],
+            courses_per_student=options['courses_per_student'],
+            grade_density=options['grade_density'],
+            languages=options['languages'].split(','),
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+
+        for name, count in counts.items():
+            self.stdout.write(f'{name:>12}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Done in {elapsed:.1f}s'))
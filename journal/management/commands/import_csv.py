@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.imports import IMPORT_BATCH_SIZE, IMPORTERS
+from journal.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Імпортує записи на курс або оцінки з CSV-файлу.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--dry-run', action='store_true', help='Лише перевірити файл, без збереження.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(id=options['course_id']).first()
+        if course is None:
+            raise CommandError(f"Course {options['course_id']} does not exist.")
+
+        with open(options['path'], 'rb') as file:
+            report = IMPORTERS[options['kind']](
+                course, file, dry_run=options['dry_run'], batch_size=options['batch_size'],
+            )
+
+        counts = ', '.join(f'{name} {count}' for name, count in sorted(report.counts.items()))
+        self.stdout.write(f"{'dry run' if report.dry_run else 'imported'}: {report.rows} rows ({counts}), "
+                          f'{report.error_count} errors')
+        for line, message in report.errors:
+            self.stderr.write(f'line {line}: {message}')
+        if report.failure:
+            raise CommandError(f'{report.failure} ({report.committed} rows saved)')
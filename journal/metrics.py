@@ -0,0 +1,256 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокування між процесами недоступне
+    fcntl = None
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Каталог, через який процеси-воркери обмінюються своїми метриками
+    'STORE_DIR': os.path.join(tempfile.gettempdir(), 'journal-metrics'),
+    # Як часто процес скидає свої метрики в спільне сховище (секунди)
+    'FLUSH_INTERVAL': 10.0,
+}
+
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Назва метрики, опис, межі кошиків
+HISTOGRAMS = (
+    ('latency', 'journal_request_latency_ms', 'Request latency in milliseconds.', LATENCY_BUCKETS),
+    ('queries', 'journal_request_queries', 'SQL queries per request.', QUERY_BUCKETS),
+    ('size', 'journal_response_size_bytes', 'Response body size in bytes.', SIZE_BUCKETS),
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+class Histogram:
+    """Гістограма з фіксованими кошиками; останній кошик - +Inf."""
+
+    def __init__(self, buckets, counts=None, total=0.0):
+        self.buckets = buckets
+        self.counts = list(counts) if counts else [0] * (len(buckets) + 1)
+        self.total = total
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.total += value
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def quantile(self, q):
+        """Оцінка квантиля лінійною інтерполяцією всередині кошика."""
+        count = self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return float(self.buckets[-1])
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            if index < len(self.buckets):
+                lower = float(self.buckets[index])
+        return float(self.buckets[-1])
+
+    def to_dict(self):
+        return {'counts': self.counts, 'sum': self.total}
+
+    @classmethod
+    def from_dict(cls, buckets, data):
+        return cls(buckets, data['counts'], data['sum'])
+
+
+class MetricsRegistry:
+    """Метрики процесу, згруповані за іменем URL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._last_flush = time.monotonic()
+
+    def observe(self, view, latency_ms, queries, size):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = {
+                    key: Histogram(buckets) for key, _, _, buckets in HISTOGRAMS
+                }
+            histograms['latency'].observe(latency_ms)
+            histograms['queries'].observe(queries)
+            if size is not None:
+                histograms['size'].observe(size)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {key: histogram.to_dict() for key, histogram in histograms.items()}
+                for view, histograms in self._views.items()
+            }
+
+    def maybe_flush(self, config):
+        """Скидає метрики в спільне сховище, якщо минув FLUSH_INTERVAL."""
+        if time.monotonic() - self._last_flush >= config['FLUSH_INTERVAL']:
+            self.flush(config)
+
+    def flush(self, config):
+        self._last_flush = time.monotonic()
+        store_dir = config['STORE_DIR']
+        os.makedirs(store_dir, exist_ok=True)
+        path = os.path.join(store_dir, f'{os.getpid()}.json')
+        _write_json(path, self.snapshot())
+
+
+registry = MetricsRegistry()
+
+
+def _write_json(path, data):
+    # Атомарний запис: читачі ніколи не бачать частково записаний файл
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for view, data in snapshot.items():
+            target = merged.setdefault(view, {
+                key: Histogram(buckets) for key, _, _, buckets in HISTOGRAMS
+            })
+            for key, _, _, buckets in HISTOGRAMS:
+                target[key].merge(Histogram.from_dict(buckets, data[key]))
+    return merged
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _store_lock(store_dir):
+    """Ексклюзивне блокування сховища (flock), щоб паралельні збори не згортали ті самі знімки."""
+    fd = os.open(os.path.join(store_dir, '.lock'), os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _read_json(path):
+    """Вміст JSON-файлу або None, якщо його вже видалив інший процес чи він пошкоджений."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def collect(config=None):
+    """Об'єднані метрики всіх процесів зі спільного сховища."""
+    config = config or get_config()
+    registry.flush(config)
+    store_dir = config['STORE_DIR']
+    retired_path = os.path.join(store_dir, 'retired.json')
+
+    with _store_lock(store_dir):
+        snapshots = []
+        dead = {}
+        for path in glob.glob(os.path.join(store_dir, '*.json')):
+            name = os.path.basename(path)[:-len('.json')]
+            snapshot = _read_json(path)
+            if snapshot is None:
+                continue
+            snapshots.append(snapshot)
+            if name.isdigit() and not _process_alive(int(name)):
+                dead[path] = snapshot
+
+        if dead:
+            # Метрики завершених процесів зберігаються в retired.json, щоб лічильники не зменшувались
+            folded = merge_snapshots([_read_json(retired_path) or {}, *dead.values()])
+            _write_json(retired_path, {
+                view: {key: histogram.to_dict() for key, histogram in histograms.items()}
+                for view, histograms in folded.items()
+            })
+            for path in dead:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    return merge_snapshots(snapshots)
+
+
+def render_prometheus(merged):
+    """Метрики у текстовому форматі Prometheus."""
+    lines = []
+    for key, name, description, buckets in HISTOGRAMS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for view in sorted(merged):
+            histogram = merged[view][key]
+            cumulative = 0
+            for bound, count in zip(buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{view="{view}"}} {histogram.total:.3f}')
+            lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+
+        quantile_name = f'{name}_quantile'
+        lines.append(f'# HELP {quantile_name} Estimated quantiles of {name}.')
+        lines.append(f'# TYPE {quantile_name} gauge')
+        for view in sorted(merged):
+            histogram = merged[view][key]
+            for q in QUANTILES:
+                lines.append(f'{quantile_name}{{view="{view}",quantile="{q}"}} {histogram.quantile(q):.3f}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_counters(counters):
+    """Лічильники {назва: (опис, значення)} у текстовому форматі Prometheus."""
+    lines = []
+    for name, (description, value) in counters.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def remove_duplicate_grades(apps, schema_editor):
+    """Залишає лише найновішу (з найбільшим id) оцінку для кожної пари заняття і студента."""
+    Grade = apps.get_model('journal', 'Grade')
+    latest_ids = (
+        Grade.objects.values('lesson_id', 'student_id')
+        .annotate(latest_id=Max('id'))
+        .values('latest_id')
+    )
+    Grade.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0009_alter_course_options_alter_coursetranslation_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_grades, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='grade',
+            unique_together={('lesson', 'student')},
+        ),
+    ]
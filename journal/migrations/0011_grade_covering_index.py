@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0010_grade_unique_lesson_student'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['lesson', 'student', 'grade'], name='journal_grade_covering_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+# Індекси за виразом LOWER(...) для пошуку студентів за початком імені користувача, імені
+# чи прізвища (journal.enrollment.search_students). Таблиця auth_user належить іншому
+# застосунку, тому індекси створюються SQL-запитом.
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('journal', '0012_lesson_schedule_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX journal_user_{field}_lower_idx ON auth_user (LOWER({field}))',
+            reverse_sql=f'DROP INDEX journal_user_{field}_lower_idx',
+        )
+        for field in SEARCH_FIELDS
+    ]
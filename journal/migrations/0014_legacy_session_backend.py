@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.db import migrations
+from django.utils import timezone
+
+# Сесії, створені до появи ProfileBackend, зберігають шлях ModelBackend, якого більше немає
+# в AUTHENTICATION_BACKENDS; без заміни шляху їх користувачі вийшли б з облікового запису.
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+LEGACY_BACKEND = 'journal.auth.LegacySessionBackend'
+
+
+def replace_session_backend(old, new):
+    def replace(apps, schema_editor):
+        if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.db':
+            return
+        from django.contrib.sessions.backends.db import SessionStore
+
+        Session = apps.get_model('sessions', 'Session')
+        store = SessionStore()
+        for session in Session.objects.filter(expire_date__gt=timezone.now()).iterator():
+            data = store.decode(session.session_data)
+            if data.get(BACKEND_SESSION_KEY) == old:
+                data[BACKEND_SESSION_KEY] = new
+                session.session_data = store.encode(data)
+                session.save(update_fields=['session_data'])
+    return replace
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sessions', '0001_initial'),
+        ('journal', '0013_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            replace_session_backend(MODEL_BACKEND, LEGACY_BACKEND),
+            replace_session_backend(LEGACY_BACKEND, MODEL_BACKEND),
+        ),
+    ]
@@ -1,10 +1,52 @@
 # Оптимізовані імпорти
 from django.db import models
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from parler.managers import TranslatableManager, TranslatableQuerySet
 from parler.models import TranslatableModel, TranslatedFields
+from parler.utils.i18n import get_active_language_choices
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 
+def translations_prefetch(model, lookup='translations', language_code=None):
+    """
+    Prefetch перекладів моделі лише для активної мови та мов-запасних.
+
+    Parler бере переклади з результатів prefetch, тому title/description всього
+    списку об'єктів читаються без додаткових запитів, включно з переходом на запасну мову.
+    """
+    translation_model = model._parler_meta.root_model
+    return Prefetch(
+        lookup,
+        queryset=translation_model.objects.filter(
+            language_code__in=get_active_language_choices(language_code)
+        ),
+    )
+
+# Набір запитів з попереднім завантаженням перекладів
+class TranslatedQuerySet(TranslatableQuerySet):
+    def with_translations(self, language_code=None):
+        """Переклади всіх об'єктів списку одним додатковим запитом."""
+        return self.prefetch_related(translations_prefetch(self.model, language_code=language_code))
+
+    def translated_values(self, *fields, language_code=None):
+        """
+        Словники з id та перекладеними полями одним запитом.
+
+        Кожне поле береться з активної мови, а якщо перекладу немає - з мови-запасної.
+        """
+        translations = self.model._parler_meta.root_model.objects.filter(master=OuterRef('pk'))
+        language_codes = get_active_language_choices(language_code)
+        expressions = {}
+        for field in fields:
+            subqueries = [
+                Subquery(translations.filter(language_code=code).values(field)[:1])
+                for code in language_codes
+            ]
+            expressions[field] = Coalesce(*subqueries) if len(subqueries) > 1 else subqueries[0]
+        return self.values('id', **expressions)
+
 # Модель курсу
 class Course(TranslatableModel):
     """
@@ -21,6 +63,8 @@ class Course(TranslatableModel):
         limit_choices_to={'role': 'teacher'}  # Обмеження на вибір тільки викладачів
     )
 
+    objects = TranslatableManager.from_queryset(TranslatedQuerySet)()
+
     class Meta:
         verbose_name = _('Course')
         verbose_name_plural = _('Courses')
@@ -76,9 +120,15 @@ class Lesson(TranslatableModel):
     course = models.ForeignKey(Course, verbose_name=_('Course'), on_delete=models.CASCADE)  # Курс
     schedule = models.DateTimeField(_('Scheduled time'))  # Час проведення
 
+    objects = TranslatableManager.from_queryset(TranslatedQuerySet)()
+
     class Meta:
         verbose_name = _('Lesson')
         verbose_name_plural = _('Lessons')
+        indexes = [
+            # Вікна журналу вибирають заняття курсу за діапазоном розкладу
+            models.Index(fields=['course', 'schedule', 'id'], name='journal_lesson_schedule_idx'),
+        ]
 
     def __str__(self):
         return f"{self.course} - {self.title}"  # Повертає назву курсу та назву заняття як рядок
@@ -97,6 +147,11 @@ class Grade(models.Model):
     class Meta:
         verbose_name = _('Grade')
         verbose_name_plural = _('Grades')
+        unique_together = [['lesson', 'student']]  # Одна оцінка студента за заняття
+        indexes = [
+            # Покриваючий індекс: оцінки курсу читаються без звернення до таблиці
+            models.Index(fields=['lesson', 'student', 'grade'], name='journal_grade_covering_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.username} - {self.lesson}"  # Повертає ім'я студента та назву заняття як рядок
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+
+from .models import Course, Enrollment
+
+PRINCIPAL_KEY = 'journal:principal:{profile_id}'
+PRINCIPAL_TIMEOUT = 60 * 60
+
+
+class Principal:
+    """Роль користувача та id курсів, які він викладає і на які записаний."""
+
+    def __init__(self, profile_id=None, role=None, taught=(), enrolled=()):
+        self.profile_id = profile_id
+        self.role = role
+        self.taught = frozenset(taught)
+        self.enrolled = frozenset(enrolled)
+
+    @property
+    def is_teacher(self):
+        return self.role == 'teacher'
+
+    def teaches(self, course_id):
+        return self.is_teacher and int(course_id) in self.taught
+
+    def is_enrolled(self, course_id):
+        return int(course_id) in self.enrolled
+
+
+def load_principal(user):
+    """
+    Principal користувача з кешу або двома запитами.
+
+    Профіль уже завантажений разом з користувачем (journal.auth.ProfileBackend),
+    тому запити потрібні лише для множин курсів. Користувач без профілю отримує
+    порожній Principal.
+    """
+    if not user.is_authenticated:
+        return Principal()
+    try:
+        profile = user.profile
+    except ObjectDoesNotExist:
+        return Principal()
+
+    key = PRINCIPAL_KEY.format(profile_id=profile.id)
+    principal = cache.get(key)
+    if principal is None:
+        principal = Principal(
+            profile.id,
+            profile.role,
+            taught=Course.objects.filter(teacher_id=profile.id).values_list('id', flat=True),
+            enrolled=Enrollment.objects.filter(student_id=profile.id).values_list('course_id', flat=True),
+        )
+        cache.set(key, principal, PRINCIPAL_TIMEOUT)
+    return principal
+
+
+def invalidate_principals(profile_ids):
+    """Видаляє кешовані Principal профілів; викликається сигналами Profile, Course і Enrollment."""
+    cache.delete_many([
+        PRINCIPAL_KEY.format(profile_id=profile_id)
+        for profile_id in set(profile_ids) if profile_id is not None
+    ])
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import after_commit, after_enrollments_change, bump_course_version, invalidate_course_members
+from .models import Course, Enrollment, Grade, Lesson, Profile
+from .principals import invalidate_principals
+
+CourseTranslation = Course._parler_meta.root_model
+LessonTranslation = Lesson._parler_meta.root_model
+# Поля користувача, які показуються в журналі та API курсу
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+# Кеш скидається через after_commit: до фіксації транзакції інші процеси ще бачать старі дані
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    after_enrollments_change(instance.course_id, [instance.student_id])
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    after_commit(invalidate_principals, [instance.id])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Ім'я викладача чи студента входить у кешований журнал і ETag API його курсів.
+    # Збереження лише last_login під час входу курси не зачіпає.
+    if update_fields is not None and not USER_DISPLAY_FIELDS & set(update_fields):
+        return
+    course_ids = (
+        Course.objects.filter(Q(teacher__user=instance) | Q(enrollment__student__user=instance))
+        .values_list('id', flat=True).distinct()
+    )
+    for course_id in course_ids:
+        after_commit(bump_course_version, course_id)
+
+
+@receiver(pre_save, sender=Course)
+def course_saving(sender, instance, **kwargs):
+    # Якщо курс передали іншому викладачу, попередній теж має втратити його в Principal
+    instance._saved_teacher_id = (
+        Course.objects.filter(id=instance.id).values_list('teacher_id', flat=True).first()
+        if instance.id is not None else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    after_commit(invalidate_course_members, instance.id, instance.teacher_id)
+    after_commit(invalidate_principals, [instance.teacher_id, getattr(instance, '_saved_teacher_id', None)])
+    after_commit(bump_course_version, instance.id)
+
+
+@receiver([post_save, post_delete], sender=CourseTranslation)
+def course_translation_changed(sender, instance, **kwargs):
+    teacher_id = Course.objects.filter(id=instance.master_id).values_list('teacher_id', flat=True).first()
+    after_commit(invalidate_course_members, instance.master_id, teacher_id)
+    after_commit(bump_course_version, instance.master_id)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    after_commit(bump_course_version, instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=LessonTranslation)
+def lesson_translation_changed(sender, instance, **kwargs):
+    course_id = Lesson.objects.filter(id=instance.master_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        after_commit(bump_course_version, course_id)
+
+
+@receiver([post_save, post_delete], sender=Grade)
+def grade_changed(sender, instance, **kwargs):
+    course_id = Lesson.objects.filter(id=instance.lesson_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        after_commit(bump_course_version, course_id)
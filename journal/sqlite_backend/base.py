@@ -0,0 +1,42 @@
+"""
+Бекенд SQLite для роботи кількох процесів з однією базою.
+
+Крім параметрів sqlite3.connect, OPTIONS приймає:
+- 'pragmas': словник PRAGMA, що виконуються на кожному новому з'єднанні;
+- 'transaction_mode': режим BEGIN для atomic() ('DEFERRED', 'IMMEDIATE' або 'EXCLUSIVE'),
+  як однойменний параметр Django 5.1.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pragmas = {}
+    transaction_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        transaction_mode = params.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES['{self.alias}']['OPTIONS']['transaction_mode'] must be "
+                f"one of {', '.join(TRANSACTION_MODES)}, not {transaction_mode!r}."
+            )
+        self.transaction_mode = transaction_mode and transaction_mode.upper()
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        # IMMEDIATE одразу бере блокування на запис: транзакція, що почала з читання,
+        # не отримає "database is locked" без очікування busy_timeout при першому записі
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -1,3 +1,1801 @@
+import copy
+import csv
+import io
+import json
+import os
+import statistics
+import tempfile
+import zipfile
+import warnings
+from datetime import timedelta
+from importlib import import_module
+from unittest.mock import patch
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, authenticate
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from middleware.query_budget_middleware import (
+    QueryBudgetExceeded,
+    QueryRecorder,
+    normalize_sql,
+    pin_query_budgets,
+)
+from middleware.session_log_writer import BufferedLogWriter, get_session_log_writer
+
+from .analytics import course_analytics, grade_array, nan_quantiles
+from .auth import ProfileBackend
+from .benchmarks import compare
+from .caching import course_student_ids, course_version, gradebook_cache_stats
+from .dashboard import load_profile_dashboard
+from .enrollment import _enrolled_ids, enroll_students, search_students
+from .forms import AddStudentForm
+from .datagen import generate_dataset
+from .imports import import_enrollments, import_grades
+from .gradebook import _window_cache_key, encode_cursor, existing_grades, grade_matrix, keyset_window, load_gradebook, load_gradebook_window, save_grade
+from .metrics import Histogram, collect, registry
+from .models import Course, Enrollment, Grade, Lesson, Profile, translations_prefetch
+from .principals import load_principal
+from .views import WINDOW_PARAMS
+from .sqlite_backend.base import DatabaseWrapper
+
+
+# Змінені вручну курсори: значення не того типу, вкладений об'єкт і null
+TAMPERED_CURSORS = [encode_cursor(values) for values in (['garbage', 1], [{'a': 1}, 1], [None, None], [True, 1.5])]
+
+
+# Допоміжні функції для створення тестових даних
+def make_profile(username, role):
+    user = User.objects.create_user(username=username)
+    return Profile.objects.create(user=user, role=role)
+
+
+def make_course(teacher, title='Math 101'):
+    return Course.objects.create(teacher=teacher, title=title, description='Basic mathematics')
+
+
+def make_lessons(course, count):
+    start = timezone.now()
+    return [
+        Lesson.objects.create(course=course, title=f'Lesson {i}', schedule=start + timedelta(days=i))
+        for i in range(count)
+    ]
+
+
+def make_students(course, count, prefix='student'):
+    students = []
+    for i in range(count):
+        student = make_profile(f'{prefix}{course.id}_{i}', 'student')
+        Enrollment.objects.create(course=course, student=student)
+        students.append(student)
+    return students
+
+
+def count_queries(func, *args, **kwargs):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        func(*args, **kwargs)
+    return len(context.captured_queries)
+
+
+class GradebookTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+
+    def grow_course(self, students, lessons):
+        new_lessons = make_lessons(self.course, lessons)
+        new_students = make_students(self.course, students, prefix=f'student{Profile.objects.count()}_')
+        for lesson in new_lessons:
+            for student in new_students:
+                Grade.objects.create(lesson=lesson, student=student, grade=50)
+
+    def test_grade_matrix_contains_every_cell(self):
+        lessons = make_lessons(self.course, 2)
+        students = make_students(self.course, 2)
+        Grade.objects.create(lesson=lessons[0], student=students[0], grade=90)
+        Grade.objects.create(lesson=lessons[1], student=students[1], grade=0)
+
+        matrix = grade_matrix(
+            self.course, [s.id for s in students], [lesson.id for lesson in lessons]
+        )
+
+        self.assertEqual(matrix[students[0].id], {lessons[0].id: 90, lessons[1].id: None})
+        self.assertEqual(matrix[students[1].id], {lessons[0].id: None, lessons[1].id: 0})
+
+    def test_load_gradebook_query_count_is_constant(self):
+        self.grow_course(students=2, lessons=2)
+        small = count_queries(load_gradebook, self.course)
+        self.grow_course(students=10, lessons=8)
+        large = count_queries(load_gradebook, self.course)
+
+        self.assertEqual(small, large)
+
+    def test_course_detail_query_count_is_constant_for_teacher(self):
+        self.client.force_login(self.teacher.user)
+        url = reverse('course_detail', args=[self.course.id])
+
+        self.grow_course(students=2, lessons=2)
+        small = count_queries(self.client.get, url)
+        self.grow_course(students=10, lessons=8)
+        large = count_queries(self.client.get, url)
+
+        self.assertEqual(small, large)
+
+    def test_course_detail_query_count_is_constant_for_student(self):
+        student = make_students(self.course, 1, prefix='viewer')[0]
+        self.client.force_login(student.user)
+        url = reverse('course_detail', args=[self.course.id])
+
+        self.grow_course(students=2, lessons=2)
+        small = count_queries(self.client.get, url)
+        self.grow_course(students=10, lessons=8)
+        large = count_queries(self.client.get, url)
+
+        self.assertEqual(small, large)
+
+    def test_save_grade_is_a_single_upsert(self):
+        lesson = make_lessons(self.course, 1)[0]
+        student = make_students(self.course, 1)[0]
+        Grade.objects.create(lesson=lesson, student=student, grade=10)
+
+        with CaptureQueriesContext(connection) as context:
+            save_grade(self.course.id, lesson.id, student.id, 95)
+
+        statements = [q['sql'] for q in context.captured_queries if q['sql'] != 'BEGIN']
+        self.assertEqual(len(statements), 1)
+        self.assertIn('ON CONFLICT', statements[0])
+        self.assertEqual(Grade.objects.get(lesson=lesson, student=student).grade, 95)
+
+    def test_course_detail_post_upserts_grade(self):
+        lesson = make_lessons(self.course, 1)[0]
+        student = make_students(self.course, 1)[0]
+        self.client.force_login(self.teacher.user)
+        url = reverse('course_detail', args=[self.course.id])
+
+        self.client.post(url, {'lesson_id': lesson.id, 'student_id': student.id, 'grade': 40})
+        self.client.post(url, {'lesson_id': lesson.id, 'student_id': student.id, 'grade': 80})
+        response = self.client.post(url, {'lesson_id': lesson.id, 'student_id': student.id, 'grade': 101})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Grade.objects.get(lesson=lesson, student=student).grade, 80)
+
+    def test_course_detail_post_rejects_other_course_cells(self):
+        lesson = make_lessons(self.course, 1)[0]
+        student = make_students(self.course, 1)[0]
+        other_course = make_course(make_profile('other_teacher', 'teacher'), title='Other')
+        other_lesson = make_lessons(other_course, 1)[0]
+        outsider = make_students(other_course, 1)[0]
+        self.client.force_login(self.teacher.user)
+        url = reverse('course_detail', args=[self.course.id])
+
+        for lesson_id, student_id in [
+            (other_lesson.id, student.id), (lesson.id, outsider.id), ('1 OR 1', student.id), (lesson.id, 'x'),
+        ]:
+            response = self.client.post(url, {'lesson_id': lesson_id, 'student_id': student_id, 'grade': 50})
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Grade.objects.exists())
+
+    def test_course_detail_renders_grades(self):
+        lesson = make_lessons(self.course, 1)[0]
+        student = make_students(self.course, 1)[0]
+        Grade.objects.create(lesson=lesson, student=student, grade=77)
+        self.client.force_login(self.teacher.user)
+
+        response = self.client.get(reverse('course_detail', args=[self.course.id]))
+
+        self.assertContains(response, '77')
+
+
+class ProfileDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.student = make_profile('student', 'student')
+
+    def enroll_in_new_courses(self, count, lessons=3):
+        for i in range(count):
+            course = make_course(self.teacher, title=f'Course {Course.objects.count()}')
+            Enrollment.objects.create(course=course, student=self.student)
+            for lesson in make_lessons(course, lessons):
+                Grade.objects.create(lesson=lesson, student=self.student, grade=60)
+
+    def test_dashboard_rows(self):
+        course = make_course(self.teacher)
+        Enrollment.objects.create(course=course, student=self.student)
+        lesson = make_lessons(course, 1)[0]
+        Grade.objects.create(lesson=lesson, student=self.student, grade=95)
+
+        details = load_profile_dashboard(self.student, self.student, is_teacher=False)
+
+        self.assertEqual(details[0]['course'], course)
+        self.assertEqual(details[0]['rows'], [{'lesson': lesson, 'grade': 95}])
+
+    def test_view_profile_query_count_is_constant(self):
+        self.client.force_login(self.student.user)
+        url = reverse('view_profile', args=[self.student.user.id])
+
+        self.enroll_in_new_courses(1)
+        small = count_queries(self.client.get, url)
+        self.enroll_in_new_courses(10)
+        large = count_queries(self.client.get, url)
+
+        self.assertEqual(small, large)
+
+    def test_teacher_can_change_grade_from_profile(self):
+        course = make_course(self.teacher)
+        Enrollment.objects.create(course=course, student=self.student)
+        lesson = make_lessons(course, 1)[0]
+        self.client.force_login(self.teacher.user)
+
+        response = self.client.post(
+            reverse('view_profile', args=[self.student.user.id]),
+            {'lesson': lesson.id, 'student': self.student.id, 'grade': 88},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Grade.objects.get(lesson=lesson, student=self.student).grade, 88)
+
+    def test_profile_grade_requires_own_course(self):
+        other_teacher = make_profile('other_teacher', 'teacher')
+        course = make_course(other_teacher)
+        Enrollment.objects.create(course=course, student=self.student)
+        lesson = make_lessons(course, 1)[0]
+        self.client.force_login(self.teacher.user)
+
+        response = self.client.post(
+            reverse('view_profile', args=[self.student.user.id]),
+            {'lesson': lesson.id, 'student': self.student.id, 'grade': 88},
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Grade.objects.exists())
+
+    def test_profile_grade_requires_enrolled_student(self):
+        lesson = make_lessons(make_course(self.teacher), 1)[0]
+        self.client.force_login(self.teacher.user)
+
+        response = self.client.post(
+            reverse('view_profile', args=[self.student.user.id]),
+            {'lesson': lesson.id, 'student': self.student.id, 'grade': 88},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Grade.objects.exists())
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 3)
+        self.students = make_students(self.course, 3)
+        for lesson in self.lessons:
+            for student in self.students:
+                Grade.objects.create(lesson=lesson, student=student, grade=75)
+
+    def test_normalize_sql_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            normalize_sql('SELECT  *\n FROM t WHERE id IN (%s, %s, %s) AND x = 5'),
+            'SELECT * FROM t WHERE id IN (...) AND x = ?',
+        )
+
+    def test_recorder_flags_repeated_queries(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for lesson in self.lessons:
+                list(Grade.objects.filter(lesson=lesson))
+
+        repeated = recorder.repeated(threshold=3)
+
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0][2], 3)
+        self.assertIn('journal/tests.py', repeated[0][1])
+
+    @pin_query_budgets(course_detail=12, view_profile=12, home=10)
+    def test_pinned_budgets_for_hot_views(self):
+        student = self.students[0]
+        self.client.force_login(self.teacher.user)
+        self.client.get(reverse('course_detail', args=[self.course.id]))
+        self.client.get(reverse('home'))
+        self.client.force_login(student.user)
+        self.client.get(reverse('view_profile', args=[student.user.id]))
+        self.client.get(reverse('home'))
+
+    def test_exceeding_budget_raises(self):
+        self.client.force_login(self.teacher.user)
+        with pin_query_budgets(course_detail=1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('course_detail', args=[self.course.id]))
+
+    def test_header_action_reports_query_count(self):
+        self.client.force_login(self.teacher.user)
+        config = {'ENABLED': True, 'ACTIONS': ['header'], 'BUDGETS': {'home': 10}}
+        with self.settings(QUERY_BUDGET=config):
+            response = self.client.get(reverse('home'))
+
+        self.assertEqual(response['X-Query-Budget'], '10')
+        self.assertGreater(int(response['X-Query-Count']), 0)
+
+
+class BufferedLogWriterTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'session_logs.txt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_lines(self, path=None):
+        with open(path or self.path) as file:
+            return file.read().splitlines()
+
+    def test_close_flushes_queued_records(self):
+        writer = BufferedLogWriter(self.path, flush_interval=60)
+        for i in range(100):
+            writer.write(f'record {i}')
+        writer.close()
+
+        self.assertEqual(self.read_lines(), [f'record {i}' for i in range(100)])
+
+    def test_rotates_by_size(self):
+        writer = BufferedLogWriter(self.path, max_bytes=50, backup_count=2, flush_interval=60)
+        writer.write('x' * 40)
+        writer.close()
+        writer.write('y' * 40)
+        writer.close()
+
+        backups = [name for name in os.listdir(self.directory.name) if name.startswith('session_logs.txt.')]
+        backups.remove('session_logs.txt.lock')
+        self.assertEqual(self.read_lines(), ['y' * 40])
+        self.assertEqual(len(backups), 1)
+        self.assertEqual(self.read_lines(os.path.join(self.directory.name, backups[0])), ['x' * 40])
+
+    def test_rotates_by_time(self):
+        writer = BufferedLogWriter(self.path, rotate_interval=60, flush_interval=60)
+        writer.write('old')
+        writer.close()
+        # Останній запис у файл був дві хвилини тому
+        past = os.path.getmtime(self.path) - 120
+        os.utime(self.path, (past, past))
+        writer.write('new')
+        writer.close()
+
+        self.assertEqual(self.read_lines(), ['new'])
+
+    def test_write_error_does_not_stop_writer(self):
+        def formatter(record):
+            if record == 'bad':
+                raise OSError('No space left on device')
+            return record
+
+        writer = BufferedLogWriter(self.path, batch_size=1, flush_interval=60, formatter=formatter)
+        with self.assertLogs('journal.session_log', 'ERROR'):
+            writer.write('bad')
+            writer.write('good')
+            writer.close()
+
+        self.assertEqual(self.read_lines(), ['good'])
+
+    def test_close_registered_at_exit_once(self):
+        writer = BufferedLogWriter(self.path, flush_interval=60)
+        with patch('middleware.session_log_writer.atexit.register') as register:
+            for _ in range(3):
+                writer.write('record')
+                writer.close()
+
+        register.assert_called_once_with(writer.close)
+
+    def test_tests_do_not_write_project_log(self):
+        path = get_session_log_writer().path
+        self.assertNotEqual(path, str(settings.SESSION_LOG['PATH']))
+        self.assertFalse(path.startswith(str(settings.BASE_DIR)))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = {'ENABLED': True, 'STORE_DIR': self.directory.name, 'FLUSH_INTERVAL': 0}
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram((10, 20, 30))
+        for value in range(1, 31):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 30)
+        self.assertAlmostEqual(histogram.quantile(0.5), 15.0)
+        self.assertAlmostEqual(histogram.quantile(0.99), 29.7)
+
+    def test_endpoint_is_staff_only(self):
+        self.client.force_login(self.teacher.user)
+        with self.settings(METRICS=self.config):
+            response = self.client.get('/metrics/')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_endpoint_merges_worker_snapshots(self):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        Profile.objects.create(user=staff)
+        # Знімок іншого воркера у спільному сховищі
+        other_snapshot = {'home': {
+            'latency': {'counts': [0] * 12, 'sum': 0.0},
+            'queries': {'counts': [0] * 11, 'sum': 0.0},
+            'size': {'counts': [0] * 9, 'sum': 0.0},
+        }}
+        other_snapshot['home']['latency']['counts'][0] = 1000
+        with open(os.path.join(self.directory.name, '1.json'), 'w') as file:
+            json.dump(other_snapshot, file)
+
+        with self.settings(METRICS=self.config):
+            self.client.force_login(self.teacher.user)
+            self.client.get(reverse('course_detail', args=[self.course.id]))
+            self.client.force_login(staff)
+            response = self.client.get('/metrics/')
+
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('journal_request_latency_ms_bucket{view="course_detail",le="+Inf"}', body)
+        self.assertIn('journal_request_queries_quantile{view="course_detail",quantile="0.95"}', body)
+        home_count = registry.snapshot().get('home', {}).get('latency', {}).get('counts', [])
+        self.assertIn(f'journal_request_latency_ms_count{{view="home"}} {1000 + sum(home_count)}', body)
+
+    def test_dead_worker_snapshot_is_folded_once(self):
+        snapshot = {'home': {
+            'latency': {'counts': [1000] + [0] * 11, 'sum': 0.0},
+            'queries': {'counts': [0] * 11, 'sum': 0.0},
+            'size': {'counts': [0] * 9, 'sum': 0.0},
+        }}
+        # Процесу з таким pid не існує
+        dead_path = os.path.join(self.directory.name, '999999999.json')
+        with open(dead_path, 'w') as file:
+            json.dump(snapshot, file)
+
+        def removed_concurrently(path):
+            os.unlink(path)
+            raise FileNotFoundError(path)
+
+        # Файл зник раніше, ніж збір дійшов до його видалення
+        with patch('journal.metrics.os.remove', side_effect=removed_concurrently):
+            first = collect(self.config)
+        second = collect(self.config)
+
+        self.assertEqual(first['home']['latency'].count, second['home']['latency'].count)
+        self.assertFalse(os.path.exists(dead_path))
+        with open(os.path.join(self.directory.name, 'retired.json')) as file:
+            self.assertEqual(json.load(file)['home']['latency']['counts'][0], 1000)
+
+
+class DatasetGeneratorTests(TestCase):
+    def test_generates_requested_volumes(self):
+        counts = generate_dataset(
+            teachers=2, courses=3, students=10, lessons_per_course=4,
+            courses_per_student=2, grade_density=1.0, languages=['uk', 'en'],
+            batch_size=7,
+        )
+
+        self.assertEqual(counts['enrollments'], 20)
+        self.assertEqual(counts['grades'], 80)
+        self.assertEqual(Profile.objects.filter(role='student').count(), 10)
+        self.assertEqual(Lesson.objects.count(), 12)
+        self.assertEqual(Grade.objects.count(), 80)
+        course = Course.objects.first()
+        self.assertEqual(course.safe_translation_getter('title', language_code='en'), 'Course 0 (en)')
+        self.assertEqual(course.teacher.role, 'teacher')
+
+
+class BenchmarkCompareTests(TestCase):
+    baseline = {'results': {'home': {'median_ms': 10.0, 'queries': 5, 'peak_kb': 100.0}}}
+
+    def report(self, **result):
+        return {'results': {'home': {'median_ms': 10.0, 'queries': 5, 'peak_kb': 100.0, **result}}}
+
+    def test_no_regression_within_tolerance(self):
+        self.assertEqual(compare(self.report(median_ms=12.0), self.baseline), [])
+
+    def test_more_queries_is_a_regression(self):
+        self.assertEqual(len(compare(self.report(queries=6), self.baseline)), 1)
+
+    def test_slower_median_is_a_regression(self):
+        self.assertEqual(len(compare(self.report(median_ms=20.0), self.baseline, timings=True)), 1)
+
+    def test_higher_peak_memory_is_a_regression(self):
+        self.assertEqual(len(compare(self.report(peak_kb=200.0), self.baseline, timings=True)), 1)
+
+    def test_timings_are_ignored_by_default(self):
+        # Базові результати іншої машини не дають хибних регресій часу
+        self.assertEqual(compare(self.report(median_ms=20.0, peak_kb=200.0), self.baseline), [])
+
+
+class BulkGradebookTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 3)
+        self.students = make_students(self.course, 4)
+        self.url = reverse('save_gradebook', args=[self.course.id])
+        self.client.force_login(self.teacher.user)
+
+    def cell(self, student, lesson):
+        return f'grade-{student.id}-{lesson.id}'
+
+    def test_saves_whole_matrix_in_one_request(self):
+        Grade.objects.create(lesson=self.lessons[0], student=self.students[0], grade=10)
+        data = {
+            self.cell(student, lesson): str(50 + i)
+            for i, (student, lesson) in enumerate(
+                (student, lesson) for student in self.students for lesson in self.lessons
+            )
+        }
+
+        response = self.client.post(self.url, data)
+
+        self.assertRedirects(response, reverse('course_detail', args=[self.course.id]))
+        self.assertEqual(Grade.objects.count(), 12)
+        self.assertEqual(Grade.objects.get(lesson=self.lessons[0], student=self.students[0]).grade, 50)
+
+    def test_reports_every_invalid_cell_and_saves_nothing(self):
+        other_course = make_course(self.teacher, title='Other')
+        foreign_lesson = make_lessons(other_course, 1)[0]
+        data = {
+            self.cell(self.students[0], self.lessons[0]): '70',
+            self.cell(self.students[1], self.lessons[0]): '101',
+            self.cell(self.students[2], self.lessons[1]): 'abc',
+            self.cell(self.students[3], foreign_lesson): '50',
+            self.cell(self.students[3], self.lessons[2]): '',
+        }
+
+        response = self.client.post(self.url, data, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {
+            self.cell(self.students[1], self.lessons[0]),
+            self.cell(self.students[2], self.lessons[1]),
+            self.cell(self.students[3], foreign_lesson),
+        })
+        self.assertFalse(Grade.objects.exists())
+
+    def test_invalid_form_post_rerenders_with_errors(self):
+        response = self.client.post(self.url, {self.cell(self.students[0], self.lessons[0]): '150'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(response, 'is-invalid', status_code=400)
+        self.assertContains(response, 'value="150"', status_code=400)
+
+    def test_unchanged_cells_are_not_written(self):
+        Grade.objects.create(lesson=self.lessons[0], student=self.students[0], grade=70)
+        data = {
+            self.cell(self.students[0], self.lessons[0]): '70',
+            self.cell(self.students[1], self.lessons[0]): '80',
+        }
+
+        response = self.client.post(self.url, data, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.json(), {'saved': 1, 'errors': {}})
+
+    def test_only_course_teacher_can_save(self):
+        other_teacher = make_profile('other', 'teacher')
+        self.client.force_login(other_teacher.user)
+
+        response = self.client.post(self.url, {self.cell(self.students[0], self.lessons[0]): '70'})
+
+        self.assertEqual(response.status_code, 403)
+
+
+class TranslationPrefetchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        # Переклади лише українською: англійська сторінка використовує запасну мову
+        with translation.override('uk'):
+            self.course = make_course(self.teacher, title='Курс')
+
+    def add_lessons(self, count):
+        with translation.override('uk'):
+            make_lessons(self.course, count)
+
+    def test_lessons_fall_back_without_extra_queries(self):
+        self.add_lessons(3)
+        with translation.override('en'):
+            lessons = list(
+                Lesson.objects.filter(course=self.course).select_related('course')
+                .prefetch_related(translations_prefetch(Course, 'course__translations')).with_translations()
+            )
+            with self.assertNumQueries(0):
+                titles = [str(lesson) for lesson in lessons]
+
+        self.assertEqual(titles, ['Курс - Lesson 0', 'Курс - Lesson 1', 'Курс - Lesson 2'])
+
+    def test_course_detail_translation_queries_are_constant(self):
+        self.client.force_login(self.teacher.user)
+        with translation.override('en'):
+            url = reverse('course_detail', args=[self.course.id])
+
+        self.add_lessons(2)
+        small = count_queries(self.client.get, url)
+        self.add_lessons(20)
+        large = count_queries(self.client.get, url)
+
+        self.assertEqual(small, large)
+        response = self.client.get(url)
+        self.assertContains(response, 'Lesson 17')
+        self.assertContains(response, 'lessons_after=')  # решта занять у наступному вікні
+
+
+class HomeCoursesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.student = make_profile('student', 'student')
+        self.url = reverse('home')
+
+    def enroll_in_new_courses(self, count):
+        for i in range(count):
+            course = make_course(self.teacher, title=f'Course {Course.objects.count()}')
+            Enrollment.objects.create(course=course, student=self.student)
+
+    def test_student_home_query_count_is_constant(self):
+        self.client.force_login(self.student.user)
+        self.enroll_in_new_courses(1)
+        small = count_queries(self.client.get, self.url)
+        self.enroll_in_new_courses(15)
+        large = count_queries(self.client.get, self.url)
+
+        self.assertEqual(small, large)
+
+    def test_cached_list_skips_course_query(self):
+        self.enroll_in_new_courses(2)
+        self.client.force_login(self.student.user)
+        cold = count_queries(self.client.get, self.url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(context.captured_queries), cold - 1)
+        self.assertContains(response, 'Course 1')
+
+    def test_enrollment_invalidates_cached_list(self):
+        self.client.force_login(self.student.user)
+        self.client.get(self.url)
+        course = make_course(self.teacher, title='New course')
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(course=course, student=self.student)
+
+        self.assertContains(self.client.get(self.url), 'New course')
+
+    def test_course_title_change_invalidates_cached_list(self):
+        self.enroll_in_new_courses(1)
+        self.client.force_login(self.teacher.user)
+        self.client.get(self.url)
+        course = Course.objects.get()
+        course.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+
+        self.assertContains(self.client.get(self.url), 'Renamed')
+
+    def test_title_falls_back_to_ukrainian(self):
+        with translation.override('uk'):
+            course = make_course(self.teacher, title='Лише українською')
+        Enrollment.objects.create(course=course, student=self.student)
+        self.client.force_login(self.student.user)
+        with translation.override('en'):
+            url = reverse('home')
+
+        self.assertContains(self.client.get(url), 'Лише українською')
+
+
+class GradebookCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lesson = make_lessons(self.course, 1)[0]
+        self.student = make_students(self.course, 1)[0]
+        self.url = reverse('course_detail', args=[self.course.id])
+        self.client.force_login(self.teacher.user)
+
+    def test_second_view_is_served_from_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+
+        self.assertFalse(any('journal_grade' in q['sql'] for q in context.captured_queries))
+        self.assertEqual(gradebook_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_grade_post_invalidates_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'lesson_id': self.lesson.id, 'student_id': self.student.id, 'grade': 64})
+
+        self.assertContains(self.client.get(self.url), '64')
+
+    def test_version_bumped_only_after_commit(self):
+        version = course_version(self.course.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Grade.objects.create(lesson=self.lesson, student=self.student, grade=1)
+            save_grade(self.course.id, self.lesson.id, self.student.id, 2)
+            # Поки транзакція не зафіксована, інші процеси мають і далі бачити стару версію
+            self.assertEqual(course_version(self.course.id), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertLess(version, course_version(self.course.id))
+
+    def test_signals_bump_course_version(self):
+        version = course_version(self.course.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.create(lesson=self.lesson, student=self.student, grade=1)
+        after_grade = course_version(self.course.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_lessons(self.course, 1)
+        after_lesson = course_version(self.course.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.filter(course=self.course).delete()
+
+        self.assertLess(version, after_grade)
+        self.assertLess(after_grade, after_lesson)
+        self.assertLess(after_lesson, course_version(self.course.id))
+
+    def test_cache_is_per_language(self):
+        self.lesson.set_current_language('en')
+        self.lesson.title = 'English title'
+        self.lesson.save()
+        self.client.get(self.url)
+        with translation.override('en'):
+            url = reverse('course_detail', args=[self.course.id])
+
+        self.assertContains(self.client.get(url), 'English title')
+
+
+class LessonGradingFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 5)
+        self.students = make_students(self.course, 4)
+        self.client.force_login(self.teacher.user)
+
+    def test_student_options_are_rendered_once(self):
+        response = self.client.get(reverse('course_detail', args=[self.course.id]))
+
+        self.assertEqual(response.content.decode().count('<option'), len(self.students))
+        self.assertContains(response, 'class="lesson-grading"', count=len(self.lessons))
+
+    def test_fragment_contains_lesson_form(self):
+        lesson = self.lessons[2]
+        response = self.client.get(reverse('lesson_grading', args=[self.course.id, lesson.id]))
+
+        self.assertContains(response, f'name="lesson_id" value="{lesson.id}"')
+        self.assertNotContains(response, '<option')
+
+    def test_fragment_requires_course_teacher(self):
+        other = make_profile('other', 'teacher')
+        self.client.force_login(other.user)
+
+        response = self.client.get(reverse('lesson_grading', args=[self.course.id, self.lessons[0].id]))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_fragment_for_lesson_of_other_course_is_404(self):
+        other_course = make_course(self.teacher, title='Other')
+
+        response = self.client.get(reverse('lesson_grading', args=[other_course.id, self.lessons[0].id]))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class CourseAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 3)
+        self.students = make_students(self.course, 4)
+        # Студент 3 не має оцінок, заняття 2 оцінене лише одним студентом
+        self.values = {
+            (0, 0): 50, (0, 1): 95, (0, 2): 100,
+            (1, 0): 70, (1, 1): 65,
+            (2, 0): 9, (2, 1): 80,
+        }
+        Grade.objects.bulk_create([
+            Grade(student=self.students[s], lesson=self.lessons[l], grade=value)
+            for (s, l), value in self.values.items()
+        ])
+
+    def test_grade_array_is_dense_with_nan_for_missing(self):
+        array = grade_array(
+            self.course, [s.id for s in self.students], [l.id for l in self.lessons]
+        )
+
+        self.assertEqual(array.shape, (4, 3))
+        self.assertEqual(array[0, 1], 95)
+        self.assertTrue(np.isnan(array[3]).all())
+        self.assertEqual(int(np.isnan(array).sum()), 12 - len(self.values))
+
+    def test_statistics_match_python_computation(self):
+        analytics = course_analytics(self.course)
+
+        lesson = analytics['lessons'][0]
+        first_lesson = [50, 70, 9]
+        self.assertEqual(lesson['mean'], round(statistics.mean(first_lesson), 2))
+        self.assertEqual(lesson['median'], statistics.median(first_lesson))
+        self.assertEqual(lesson['std'], round(statistics.pstdev(first_lesson), 2))
+        self.assertEqual(lesson['missing'], 1)
+        self.assertEqual(lesson['distribution'], [1, 0, 0, 0, 0, 1, 0, 1, 0, 0])
+
+        student = analytics['students'][0]
+        self.assertEqual(student['percentiles']['25'], 72.5)
+        self.assertEqual(student['distribution'][9], 2)  # 95 і 100 в останньому інтервалі
+
+        empty = analytics['students'][3]
+        self.assertIsNone(empty['mean'])
+        self.assertEqual(empty['missing'], 3)
+        self.assertEqual(analytics['overall']['graded'], len(self.values))
+
+    def test_quantiles_match_numpy(self):
+        array = np.random.default_rng(0).integers(0, 101, (40, 15)).astype(float)
+        array[np.random.default_rng(1).random(array.shape) < 0.3] = np.nan
+        array[:, 2] = np.nan
+        for axis in (0, 1):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # стовпець без оцінок
+                expected = np.nanpercentile(array, (10, 50, 90), axis=axis)
+            np.testing.assert_allclose(nan_quantiles(array, (10, 50, 90), axis), expected)
+
+    def test_grades_are_loaded_in_one_query_when_gradebook_is_cached(self):
+        course_analytics(self.course)
+        with CaptureQueriesContext(connection) as context:
+            course_analytics(self.course)
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_api_returns_json_for_course_teacher(self):
+        self.client.force_login(self.teacher.user)
+
+        response = self.client.get(reverse('course_analytics_api', args=[self.course.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['shape'], {'students': 4, 'lessons': 3})
+        page = self.client.get(reverse('course_analytics', args=[self.course.id]))
+        self.assertContains(page, 'Lesson 2')
+
+    def test_analytics_is_forbidden_for_students(self):
+        self.client.force_login(self.students[0].user)
+
+        response = self.client.get(reverse('course_analytics_api', args=[self.course.id]))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_cached_analytics_follow_course_version(self):
+        self.client.force_login(self.teacher.user)
+        url = reverse('course_analytics_api', args=[self.course.id])
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            save_grade(self.course.id, self.lessons[2].id, self.students[3].id, 40)
+
+        self.assertEqual(self.client.get(url).json()['students'][3]['mean'], 40)
+
+
+class GradebookExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 3)
+        self.students = make_students(self.course, 3)
+        for i, student in enumerate(self.students):
+            student.user.first_name, student.user.last_name = f'Name{i}', f'Surname{2 - i}'
+            student.user.save()
+        Grade.objects.create(lesson=self.lessons[0], student=self.students[0], grade=90)
+        Grade.objects.create(lesson=self.lessons[2], student=self.students[2], grade=75)
+        # Оцінка студента, якого вже виключено з курсу, не потрапляє в експорт
+        removed = make_profile('removed', 'student')
+        Grade.objects.create(lesson=self.lessons[1], student=removed, grade=10)
+        self.client.force_login(self.teacher.user)
+
+    def read_csv(self, response):
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_course_csv_streams_gradebook_matrix(self):
+        response = self.client.get(reverse('export_course', args=[self.course.id]))
+
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0][2:], ['Lesson 0', 'Lesson 1', 'Lesson 2'])
+        # Студенти впорядковані за прізвищем, як у журналі
+        self.assertEqual(rows[1], ['Name2 Surname0', self.students[2].user.username, '', '', '75'])
+        self.assertEqual(rows[3], ['Name0 Surname2', self.students[0].user.username, '90', '', ''])
+        self.assertEqual(len(rows), 4)
+
+    def test_headers_use_active_language_titles(self):
+        lesson = self.lessons[1]
+        lesson.set_current_language('en')
+        lesson.title = 'English title'
+        lesson.save()
+
+        with translation.override('en'):
+            response = self.client.get(reverse('export_course', args=[self.course.id]))
+
+        self.assertEqual(self.read_csv(response)[0][3], 'English title')
+
+    def test_csv_neutralizes_formula_cells(self):
+        lesson = self.lessons[0]
+        lesson.title = '=HYPERLINK("http://example.com")'
+        lesson.save()
+        user = self.students[2].user
+        user.first_name, user.last_name = '@SUM(A1)', '-1'
+        user.save()
+
+        rows = self.read_csv(self.client.get(reverse('export_course', args=[self.course.id])))
+
+        self.assertEqual(rows[0][2], '\'=HYPERLINK("http://example.com")')
+        self.assertIn(["'@SUM(A1) -1", user.username, '', '', '75'], rows)
+
+    def test_xlsx_is_valid_workbook(self):
+        response = self.client.get(reverse('export_course', args=[self.course.id]), {'format': 'xlsx'})
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('xl/workbook.xml', archive.namelist())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn('<c><v>90</v></c>', sheet)
+        self.assertIn('Math 101', archive.read('xl/workbook.xml').decode())
+
+    def test_all_courses_export_has_section_per_course(self):
+        other = make_course(self.teacher, title='Physics')
+        make_lessons(other, 2)
+
+        response = self.client.get(reverse('export_courses'), {'format': 'xlsx'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('xl/worksheets/sheet2.xml', archive.namelist())
+
+        rows = self.read_csv(self.client.get(reverse('export_courses')))
+        self.assertEqual(rows[0], ['Math 101'])
+        self.assertIn(['Physics'], rows)
+
+    def test_export_is_forbidden_for_students_and_unknown_format(self):
+        response = self.client.get(reverse('export_course', args=[self.course.id]), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(self.students[0].user)
+        self.assertEqual(self.client.get(reverse('export_course', args=[self.course.id])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export_courses')).status_code, 403)
+
+
+def csv_file(lines):
+    return io.BytesIO(('\n'.join(lines) + '\n').encode('utf-8-sig'))
+
+
+class CsvImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 3)
+        self.students = make_students(self.course, 2)
+        self.newcomers = [make_profile(f'new{i}', 'student') for i in range(3)]
+
+    def test_enrollment_dry_run_reports_without_writing(self):
+        report = import_enrollments(self.course, csv_file([
+            'username', 'new0', 'new1', self.students[0].user.username, 'nobody', 'teacher', 'new0',
+        ]), dry_run=True)
+
+        self.assertEqual(report.rows, 6)
+        self.assertEqual(report.counts['created'], 2)
+        self.assertEqual(report.counts['skipped'], 2)  # вже записаний і повтор у файлі
+        self.assertEqual([line for line, _ in report.errors], [5, 6])
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 2)
+
+    def test_enrollment_import_writes_in_batches_and_refreshes_home(self):
+        student = self.newcomers[2]
+        self.client.force_login(student.user)
+        self.assertNotContains(self.client.get(reverse('home')), 'Math 101')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_enrollments(
+                self.course, csv_file([profile.user.username for profile in self.newcomers]), batch_size=2,
+            )
+
+        self.assertEqual(report.counts['created'], 3)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 5)
+        self.assertContains(self.client.get(reverse('home')), 'Math 101')
+
+    def test_unreadable_later_batch_keeps_committed_batches(self):
+        upload = io.BytesIO(b'new0\nnew1\nnew2\xff\n')
+        course_student_ids(self.course.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_enrollments(self.course, upload, batch_size=1)
+
+        self.assertIn('Could not read the CSV file', report.failure)
+        self.assertEqual(report.committed, 2)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 4)
+        self.assertIn(self.newcomers[1].id, course_student_ids(self.course.id))
+
+    def test_existing_grades_are_read_only_for_imported_cells(self):
+        first, second = self.students
+        for student in self.students:
+            for lesson in self.lessons:
+                Grade.objects.create(lesson=lesson, student=student, grade=10)
+
+        existing = existing_grades({(first.id, self.lessons[0].id): 1, (second.id, self.lessons[2].id): 1})
+
+        self.assertEqual(existing, {(first.id, self.lessons[0].id): 10, (second.id, self.lessons[2].id): 10})
+
+    def test_grade_import_counts_created_updated_and_unchanged(self):
+        first, second = self.students
+        Grade.objects.create(lesson=self.lessons[0], student=first, grade=50)
+        Grade.objects.create(lesson=self.lessons[1], student=first, grade=60)
+        lesson_ids = [lesson.id for lesson in self.lessons]
+
+        report = import_grades(self.course, csv_file([
+            f'{first.user.username},{lesson_ids[0]},55',
+            f'{first.user.username},{lesson_ids[1]},60',
+            f'{second.user.username},{lesson_ids[2]},70',
+            f'{second.user.username},{lesson_ids[2]},75',
+            f'{second.user.username},999999,70',
+            f'{second.user.username},{lesson_ids[0]},101',
+            f'new0,{lesson_ids[0]},80',
+            f'{second.user.username},{lesson_ids[0]}',
+        ]))
+
+        self.assertEqual(dict(report.counts), {'created': 1, 'updated': 1, 'unchanged': 1})
+        self.assertEqual([line for line, _ in report.errors], [5, 6, 7, 8])
+        grades = dict(Grade.objects.values_list('lesson_id', 'grade').filter(student=second))
+        self.assertEqual(grades, {lesson_ids[2]: 75})  # останнє значення клітинки
+        self.assertEqual(Grade.objects.get(lesson=self.lessons[0], student=first).grade, 55)
+
+    def test_grade_dry_run_counts_repeated_cell_once_across_batches(self):
+        username, lesson_id = self.students[0].user.username, self.lessons[0].id
+
+        report = import_grades(self.course, csv_file([
+            f'{username},{lesson_id},50', f'{username},{lesson_id},60', f'{username},{lesson_id},60',
+        ]), dry_run=True, batch_size=1)
+
+        self.assertEqual(dict(report.counts), {'created': 1, 'updated': 1, 'unchanged': 1})
+        self.assertFalse(Grade.objects.exists())
+
+    def test_grade_import_queries_do_not_grow_with_rows(self):
+        def run(count):
+            lines = [
+                f'{self.students[i % 2].user.username},{self.lessons[i % 3].id},{i}'
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                import_grades(self.course, csv_file(lines), dry_run=True)
+            return len(context.captured_queries)
+
+        self.assertEqual(run(6), run(60))
+
+    def test_upload_view_shows_dry_run_report(self):
+        self.client.force_login(self.teacher.user)
+        upload = SimpleUploadedFile('students.csv', b'new0\nnew1\n', content_type='text/csv')
+
+        response = self.client.post(reverse('import_csv', args=[self.course.id]), {
+            'kind': 'enrollments', 'file': upload, 'dry_run': 'on',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report'].counts['created'], 2)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 2)
+
+    def test_upload_view_is_forbidden_for_students(self):
+        self.client.force_login(self.students[0].user)
+        response = self.client.get(reverse('import_csv', args=[self.course.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class CourseEnrollmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        make_lessons(self.course, 2)
+        self.student = make_profile('newcomer', 'student')
+        self.client.force_login(self.student.user)
+
+    def test_student_get_runs_no_writes(self):
+        url = reverse('course_detail', args=[self.course.id])
+        self.client.get(url)  # Прогріває кеш сесії та членства
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertFalse(response.context['enrolled'])
+        self.assertContains(response, reverse('enroll_course', args=[self.course.id]))
+        self.assertFalse(Enrollment.objects.filter(course=self.course, student=self.student).exists())
+        writes = [q['sql'] for q in context.captured_queries
+                  if q['sql'].split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+
+    def test_enroll_action_refreshes_cached_membership(self):
+        url = reverse('course_detail', args=[self.course.id])
+        self.assertFalse(self.client.get(url).context['enrolled'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('enroll_course', args=[self.course.id]))
+        self.assertRedirects(response, url)
+        self.assertTrue(self.client.get(url).context['enrolled'])
+        # Повторний запис нічого не змінює
+        self.client.post(reverse('enroll_course', args=[self.course.id]))
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.filter(course=self.course).get().delete()
+        self.assertFalse(self.client.get(url).context['enrolled'])
+
+    def test_membership_is_dropped_only_after_commit(self):
+        enrollment = Enrollment.objects.create(course=self.course, student=self.student)
+        self.assertIn(self.student.id, course_student_ids(self.course.id))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            enrollment.delete()
+            enroll_students(self.course, student_ids=[make_profile('other', 'student').id])
+        # До фіксації кешована множина лишається, тож її не перечитають зі старих даних
+        self.assertIn(self.student.id, course_student_ids(self.course.id))
+
+        for callback in callbacks:
+            callback()
+        self.assertNotIn(self.student.id, course_student_ids(self.course.id))
+
+    def test_enroll_requires_post_and_student_role(self):
+        url = reverse('enroll_course', args=[self.course.id])
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        self.client.force_login(self.teacher.user)
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.assertFalse(Enrollment.objects.exists())
+
+
+class PrincipalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lesson = make_lessons(self.course, 1)[0]
+        self.student = make_students(self.course, 1)[0]
+
+    def principal(self, profile):
+        return load_principal(User.objects.select_related('profile').get(id=profile.user_id))
+
+    def test_login_checks_password_once(self):
+        user = self.teacher.user
+        user.set_password('secret')
+        user.save()
+
+        with patch.object(User, 'check_password', autospec=True, side_effect=User.check_password) as check:
+            self.assertIsNone(authenticate(username='teacher', password='wrong'))
+            self.assertEqual(check.call_count, 1)
+            self.assertEqual(authenticate(username='teacher', password='secret').backend, 'journal.auth.ProfileBackend')
+        with patch.object(User, 'set_password', autospec=True) as hash_password:
+            # Для невідомого імені ModelBackend один раз хешує пароль проти атак за часом
+            self.assertIsNone(authenticate(username='nobody', password='wrong'))
+            self.assertEqual(hash_password.call_count, 1)
+
+    def test_failed_login_does_not_stop_later_backends(self):
+        self.assertIsNone(ProfileBackend().authenticate(None, username='teacher', password='wrong'))
+
+    def test_session_with_model_backend_survives_migration(self):
+        session = SessionStore()
+        session[SESSION_KEY] = str(self.teacher.user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = self.teacher.user.get_session_auth_hash()
+        session.create()
+
+        migration = import_module('journal.migrations.0014_legacy_session_backend')
+        migration.replace_session_backend(migration.MODEL_BACKEND, migration.LEGACY_BACKEND)(django_apps, None)
+
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.teacher.user)
+
+    def test_principal_is_cached_until_memberships_change(self):
+        principal = self.principal(self.teacher)
+        self.assertTrue(principal.teaches(self.course.id))
+        self.assertEqual(self.principal(self.student).enrolled, {self.course.id})
+        with self.assertNumQueries(1):  # Лише користувач з профілем
+            self.principal(self.teacher)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = make_course(self.teacher)
+        self.assertEqual(self.principal(self.teacher).taught, {self.course.id, second.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(course=second, student=self.student)
+        self.assertEqual(self.principal(self.student).enrolled, {self.course.id, second.id})
+
+        self.teacher.role = 'student'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.save()
+        self.assertFalse(self.principal(self.teacher).teaches(self.course.id))
+
+    def test_reassigned_course_leaves_previous_teacher(self):
+        self.assertTrue(self.principal(self.teacher).teaches(self.course.id))
+        other = make_profile('other', 'teacher')
+        self.course.teacher = other
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+
+        self.assertFalse(self.principal(self.teacher).teaches(self.course.id))
+        self.assertTrue(self.principal(other).teaches(self.course.id))
+
+    def test_teacher_views_check_principal(self):
+        self.client.force_login(self.teacher.user)
+        self.principal(self.teacher)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('delete_lesson', args=[self.lesson.id]))
+        self.assertRedirects(response, reverse('course_detail', args=[self.course.id]))
+        # Доступ перевіряється за кешованою множиною, без запитів до курсів і записів
+        self.assertFalse([q for q in context.captured_queries
+                          if 'FROM "journal_course"' in q['sql'] or 'FROM "journal_enrollment"' in q['sql']])
+
+        other = make_profile('other', 'teacher')
+        self.client.force_login(other.user)
+        for name in ('add_lesson', 'edit_course', 'add_student'):
+            self.assertEqual(self.client.get(reverse(name, args=[self.course.id])).status_code, 403)
+        self.client.force_login(self.student.user)
+        lesson = make_lessons(self.course, 1)[0]
+        self.assertEqual(self.client.get(reverse('edit_lesson', args=[lesson.id])).status_code, 403)
+
+
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.enrolled = make_students(self.course, 1, prefix='anna')[0]
+        self.candidates = {}
+        for username, first_name, last_name in [
+            ('anton', 'Anton', 'Bondar'), ('bohdan', 'Bohdan', 'Antonenko'),
+            ('ivanko', 'Іван', 'Коваль'), ('zoe', 'Zoe', 'Smith'),
+        ]:
+            profile = make_profile(username, 'student')
+            profile.user.first_name, profile.user.last_name = first_name, last_name
+            profile.user.save()
+            self.candidates[username] = profile
+        self.client.force_login(self.teacher.user)
+
+    def search(self, q='', after=None):
+        params = {'q': q, **({'after': after} if after else {})}
+        response = self.client.get(reverse('student_search', args=[self.course.id]), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [student['username'] for student in data['results']], data['next']
+
+    def test_prefix_search_over_username_and_names(self):
+        self.assertEqual(self.search('AN')[0], ['anton', 'bohdan'])
+        self.assertEqual(self.search('smi')[0], ['zoe'])
+        self.assertEqual(self.search('ів')[0], ['ivanko'])
+        self.assertEqual(self.search('Ков')[0], ['ivanko'])
+        self.assertEqual(self.search('x')[0], [])
+        # Записані студенти та викладачі не пропонуються
+        self.assertNotIn('anna1_0', self.search('')[0])
+        self.assertNotIn('teacher', self.search('t')[0])
+
+    def test_tampered_cursor_returns_first_page(self):
+        # ['garbage', 1] - правильний ключ (username, id) для пошуку, тому замість нього [1, 'anton']
+        for cursor in [encode_cursor([1, 'anton']), *TAMPERED_CURSORS[1:]]:
+            self.assertEqual(self.search(after=cursor)[0], ['anton', 'bohdan', 'ivanko', 'zoe'])
+
+    def test_search_pages_with_cursor(self):
+        page, cursor = search_students(self.course.id, size=3)
+        self.assertEqual([s['username'] for s in page], ['anton', 'bohdan', 'ivanko'])
+        page, cursor = search_students(self.course.id, after=cursor, size=3)
+        self.assertEqual([s['username'] for s in page], ['zoe'])
+        self.assertIsNone(cursor)
+
+    def test_search_requires_course_teacher(self):
+        self.client.force_login(make_profile('other', 'teacher').user)
+        response = self.client.get(reverse('student_search', args=[self.course.id]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_add_student_validates_only_chosen_id(self):
+        url = reverse('add_student', args=[self.course.id])
+        response = self.client.get(url)
+        self.assertNotContains(response, 'bohdan')
+
+        # Обраний профіль і множина записаних студентів, незалежно від кількості студентів
+        with self.assertNumQueries(2):
+            form = AddStudentForm({'student': self.candidates['zoe'].id}, course_id=self.course.id)
+            self.assertTrue(form.is_valid())
+
+        response = self.client.post(url, {'student': self.enrolled.id})
+        self.assertFormError(response.context['form'], 'student', 'This student is already enrolled in the course.')
+        response = self.client.post(url, {'student': self.teacher.id})
+        self.assertFalse(response.context['form'].is_valid())
+
+        response = self.client.post(url, {'student': self.candidates['zoe'].id})
+        self.assertRedirects(response, reverse('course_detail', args=[self.course.id]))
+        self.assertTrue(Enrollment.objects.filter(course=self.course, student=self.candidates['zoe']).exists())
+
+
+class BulkEnrollmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.source = make_course(self.teacher, title='Physics')
+        self.enrolled = make_students(self.course, 2)
+        self.roster = make_students(self.source, 3) + self.enrolled[:1]
+        Enrollment.objects.create(course=self.source, student=self.enrolled[0])
+        self.others = [make_profile(f'new{i}', 'student') for i in range(30)]
+
+    def test_enrolls_from_all_sources_in_one_transaction(self):
+        usernames = [p.user.username for p in self.others[10:]] + ['ghost', self.teacher.user.username]
+        with CaptureQueriesContext(connection) as context:
+            summary = enroll_students(
+                self.course,
+                student_ids=[p.id for p in self.others[:10]] + [self.enrolled[1].id],
+                source_course_id=self.source.id,
+                usernames=usernames,
+            )
+
+        expected = {p.id for p in self.others} | {p.id for p in self.roster[:3]}
+        self.assertEqual(set(summary.added), expected)
+        self.assertEqual(set(summary.skipped), {p.id for p in self.enrolled})
+        self.assertEqual(summary.unknown, ['ghost', 'teacher'])
+        self.assertEqual(
+            set(Enrollment.objects.filter(course=self.course).values_list('student_id', flat=True)),
+            expected | {p.id for p in self.enrolled},
+        )
+        # Кількість запитів не залежить від кількості студентів (вставка - у точці збереження)
+        self.assertLessEqual(len(context.captured_queries), 9)
+        self.assertTrue(self.others[0].id in course_student_ids(self.course.id))
+
+    def test_repeated_enrollment_skips_everyone(self):
+        enroll_students(self.course, source_course_id=self.source.id)
+        summary = enroll_students(self.course, source_course_id=self.source.id)
+        self.assertEqual(summary.added, [])
+        self.assertEqual(len(summary.skipped), 4)
+
+    def test_non_students_are_reported_as_skipped(self):
+        summary = enroll_students(self.course, student_ids=[self.others[0].id, self.teacher.id, 999999])
+
+        self.assertEqual(summary.added, [self.others[0].id])
+        self.assertEqual(set(summary.skipped), {self.teacher.id, 999999})
+
+    def test_concurrent_enrollment_is_not_reported_as_added(self):
+        racing, newcomer = self.others[:2]
+        # Інший запит записав студента між перевіркою і вставкою: перша перевірка його не бачить
+        Enrollment.objects.create(course=self.course, student=racing)
+        reads = [set()]
+
+        def enrolled_ids(course, student_ids):
+            return reads.pop() if reads else _enrolled_ids(course, student_ids)
+
+        with patch('journal.enrollment._enrolled_ids', side_effect=enrolled_ids):
+            summary = enroll_students(self.course, student_ids=[racing.id, newcomer.id])
+
+        self.assertEqual(summary.added, [newcomer.id])
+        self.assertEqual(summary.skipped, [racing.id])
+        self.assertEqual(Enrollment.objects.filter(course=self.course, student=racing).count(), 1)
+
+    def test_bulk_enroll_view(self):
+        self.client.force_login(self.teacher.user)
+        url = reverse('bulk_enroll', args=[self.course.id])
+        response = self.client.post(url, {
+            'students': f'{self.others[0].id},{self.others[1].id}',
+            'usernames': 'new2, new3\nnew4 nobody',
+        })
+        summary = response.context['summary']
+        self.assertEqual(len(summary.added), 5)
+        self.assertEqual(summary.unknown, ['nobody'])
+        self.assertTrue(load_principal(self.others[4].user).is_enrolled(self.course.id))
+
+        self.assertFalse(self.client.post(url, {}).context['form'].is_valid())
+        foreign = make_course(make_profile('other', 'teacher'), title='Foreign')
+        response = self.client.post(url, {'source_course': foreign.id})
+        self.assertIn('source_course', response.context['form'].errors)
+
+        self.client.force_login(self.others[0].user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class AdminChangeListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+
+    def add_course(self, index, students=3):
+        course = make_course(self.teacher, title=f'Course {index}')
+        course.set_current_language('en')
+        course.title = f'Algebra {index}'
+        course.save()
+        lessons = make_lessons(course, 2)
+        for student in make_students(course, students, prefix=f'c{index}s'):
+            for lesson in lessons:
+                Grade.objects.create(lesson=lesson, student=student, grade=50)
+        return course
+
+    def changelist(self, model, **params):
+        return self.client.get(reverse(f'admin:journal_{model}_changelist'), params)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_course(0, students=1)
+        counts = {}
+        for model in ('course', 'profile', 'enrollment', 'lesson', 'grade'):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.changelist(model).status_code, 200)
+            counts[model] = len(context.captured_queries)
+
+        for i in range(1, 4):
+            self.add_course(i)
+        for model, count in counts.items():
+            with self.assertNumQueries(count):
+                self.changelist(model)
+
+    def test_search_translated_titles(self):
+        self.add_course(0)
+        self.add_course(1)
+
+        response = self.changelist('course', q='Algebra 1')
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.changelist('enrollment', q='"Course 0"')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.changelist('grade', q='"Lesson 1" c1s')
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_large_tables_use_estimated_count(self):
+        self.add_course(0)
+        with patch('journal.admin.ESTIMATED_COUNT_THRESHOLD', 2):
+            with CaptureQueriesContext(connection) as context:
+                response = self.changelist('grade')
+        self.assertEqual(response.context['cl'].result_count, Grade.objects.count())
+        self.assertFalse([q for q in context.captured_queries if 'COUNT(*)' in q['sql']])
+
+        # З фільтром кількість рахується точно
+        response = self.changelist('grade', q='c0s1_0')
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+
+class GradebookWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 7)
+        self.students = make_students(self.course, 7)
+        for i, student in enumerate(self.students):
+            student.user.last_name = f'Surname{i}'
+            student.user.save()
+
+    def window_ids(self, **kwargs):
+        gradebook = load_gradebook_window(self.course, student_size=3, lesson_size=3, **kwargs)
+        return gradebook, [s['id'] for s in gradebook['students']], [l['id'] for l in gradebook['lessons']]
+
+    def test_windows_walk_forward_and_back(self):
+        gradebook, students, lessons = self.window_ids()
+        self.assertEqual(students, [s.id for s in self.students[:3]])
+        self.assertEqual(lessons, [l.id for l in self.lessons[:3]])
+        self.assertIsNone(gradebook['pages']['students']['previous'])
+
+        after = gradebook['pages']['students']['next']
+        gradebook, students, _ = self.window_ids(students=(after, None))
+        self.assertEqual(students, [s.id for s in self.students[3:6]])
+
+        gradebook, students, _ = self.window_ids(students=(None, gradebook['pages']['students']['previous']))
+        self.assertEqual(students, [s.id for s in self.students[:3]])
+
+        after = self.window_ids()[0]['pages']['lessons']['next']
+        after = self.window_ids(lessons=(after, None))[0]['pages']['lessons']['next']
+        gradebook, _, lessons = self.window_ids(lessons=(after, None))
+        self.assertEqual(lessons, [self.lessons[6].id])
+        self.assertIsNone(gradebook['pages']['lessons']['next'])
+
+    def test_window_is_stable_when_rows_are_added_before_it(self):
+        after = self.window_ids()[0]['pages']['students']['next']
+        for i in range(3):
+            student = make_profile(f'early{i}', 'student')
+            student.user.last_name = 'Aaa'
+            student.user.save()
+            Enrollment.objects.create(course=self.course, student=student)
+
+        _, students, _ = self.window_ids(students=(after, None))
+
+        self.assertEqual(students, [s.id for s in self.students[3:6]])
+
+    def test_grades_are_loaded_only_for_visible_cells(self):
+        Grade.objects.create(lesson=self.lessons[0], student=self.students[0], grade=80)
+        Grade.objects.create(lesson=self.lessons[5], student=self.students[5], grade=70)
+
+        gradebook, _, _ = self.window_ids()
+
+        self.assertEqual(gradebook['grades'][self.students[0].id][self.lessons[0].id], 80)
+        self.assertNotIn(self.students[5].id, gradebook['grades'])
+
+    def test_queries_do_not_depend_on_course_size(self):
+        small = count_queries(load_gradebook_window, self.course, student_size=3, lesson_size=3)
+        make_students(self.course, 20, prefix='more')
+        make_lessons(self.course, 20)
+
+        self.assertEqual(count_queries(load_gradebook_window, self.course, student_size=3, lesson_size=3), small)
+
+    def test_broken_cursor_falls_back_to_first_window(self):
+        rows, previous, _ = keyset_window(
+            Lesson.objects.filter(course=self.course), ('schedule', 'id'), 3, after='not-a-cursor',
+        )
+        self.assertEqual(rows, self.lessons[:3])
+        self.assertIsNone(previous)
+
+    def test_tampered_cursors_fall_back_to_first_window(self):
+        self.client.force_login(self.teacher.user)
+        url = reverse('course_detail', args=[self.course.id])
+        for cursor in TAMPERED_CURSORS:
+            for param in WINDOW_PARAMS:
+                response = self.client.get(url, {param: cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['lessons']), 7)
+
+    def test_junk_cursors_share_first_window_cache_key(self):
+        first = _window_cache_key(self.course, (None, None), (None, None))
+        for cursor in [*TAMPERED_CURSORS, 'not a cursor', 'x' * 500]:
+            key = _window_cache_key(self.course, (cursor, None), (None, cursor))
+            self.assertEqual(key, first)
+        self.assertLess(len(first), 250)
+
+        after = self.window_ids()[0]['pages']['students']['next']
+        self.assertNotEqual(_window_cache_key(self.course, (after, None), (None, None)), first)
+
+    def test_course_page_links_to_next_window(self):
+        self.client.force_login(self.teacher.user)
+        make_students(self.course, 60, prefix='many')
+
+        response = self.client.get(reverse('course_detail', args=[self.course.id]))
+
+        self.assertEqual(len(response.context['enrollments']), 50)
+        next_url = response.context['students_next_url']
+        response = self.client.get(reverse('course_detail', args=[self.course.id]) + next_url)
+        self.assertEqual(len(response.context['enrollments']), 17)
+        self.assertIsNone(response.context['students_next_url'])
+
+
+class GradebookApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 2)
+        self.students = make_students(self.course, 2)
+        Grade.objects.create(lesson=self.lessons[1], student=self.students[0], grade=88)
+        self.url = reverse('api_course_gradebook', args=[self.course.id])
+
+    def test_gradebook_is_matrix_with_strong_etag(self):
+        self.client.force_login(self.teacher.user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.json(), {
+            'lessons': [lesson.id for lesson in self.lessons],
+            'students': [student.id for student in self.students],
+            'grades': [[None, 88], [None, None]],
+        })
+        self.assertTrue(response['ETag'].startswith('"'))
+
+    def test_if_none_match_returns_304_without_grade_queries(self):
+        self.client.force_login(self.teacher.user)
+        etag = self.client.get(self.url)['ETag']
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in context.captured_queries if 'journal_grade' in q['sql']])
+
+    def test_etag_changes_when_grades_change(self):
+        self.client.force_login(self.teacher.user)
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            save_grade(self.course.id, self.lessons[0].id, self.students[1].id, 70)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['grades'][1][0], 70)
+
+    def test_etag_changes_when_teacher_or_student_is_renamed(self):
+        self.client.force_login(self.teacher.user)
+        info_url = reverse('api_course', args=[self.course.id])
+        etag = self.client.get(info_url)['ETag']
+
+        user = self.teacher.user
+        user.first_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        response = self.client.get(info_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['teacher']['first_name'], 'Renamed')
+
+        etag = response['ETag']
+        student = self.students[0].user
+        student.last_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            student.save()
+        self.assertEqual(self.client.get(info_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_login_does_not_bump_course_version(self):
+        version = course_version(self.course.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(self.teacher.user)
+        self.assertEqual(course_version(self.course.id), version)
+
+    def test_student_sees_only_own_row(self):
+        self.client.force_login(self.students[0].user)
+
+        data = self.client.get(self.url).json()
+        enrollments = self.client.get(reverse('api_course_enrollments', args=[self.course.id])).json()
+
+        self.assertEqual(data['students'], [self.students[0].id])
+        self.assertEqual(data['grades'], [[None, 88]])
+        self.assertEqual(len(enrollments['enrollments']), 1)
+
+    def test_outsiders_are_forbidden(self):
+        self.client.force_login(make_profile('other', 'student').user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(reverse('api_course', args=[999])).status_code, 404)
+
+    def test_course_lessons_and_list_endpoints(self):
+        self.client.force_login(self.teacher.user)
+
+        course = self.client.get(reverse('api_course', args=[self.course.id])).json()
+        lessons = self.client.get(reverse('api_course_lessons', args=[self.course.id])).json()['lessons']
+        listing = self.client.get(reverse('api_courses'))
+
+        self.assertEqual(course['title'], 'Math 101')
+        self.assertEqual([lesson['title'] for lesson in lessons], ['Lesson 0', 'Lesson 1'])
+        self.assertEqual(listing.json()['courses'], [{'id': self.course.id, 'title': 'Math 101'}])
+        again = self.client.get(reverse('api_courses'), HTTP_IF_NONE_MATCH=listing['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = make_profile('teacher', 'teacher')
+        self.course = make_course(self.teacher)
+        self.lessons = make_lessons(self.course, 3)
+        self.students = make_students(self.course, 2)
+        Grade.objects.create(lesson=self.lessons[1], student=self.students[0], grade=64)
+
+    async def get(self, profile, name, *args):
+        await self.async_client.aforce_login(profile.user)
+        return await self.async_client.get(reverse(name, args=args))
+
+    async def test_home_lists_user_courses(self):
+        response = await self.get(self.students[0], 'home_async')
+
+        self.assertContains(response, 'Math 101')
+
+    async def test_course_detail_matches_sync_view(self):
+        response = await self.get(self.teacher, 'course_detail_async', self.course.id)
+        sync_response = await self.async_client.get(reverse('course_detail', args=[self.course.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['grades'], sync_response.context['grades'])
+        self.assertEqual(response.context['lessons'], sync_response.context['lessons'])
+        self.assertContains(response, '64')
+
+    async def test_tampered_cursors_fall_back_to_first_window(self):
+        await self.async_client.aforce_login(self.teacher.user)
+        url = reverse('course_detail_async', args=[self.course.id])
+        for cursor in TAMPERED_CURSORS:
+            for param in WINDOW_PARAMS:
+                response = await self.async_client.get(url, {param: cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['lessons']), 3)
+
+    async def test_course_detail_checks_teacher_and_membership(self):
+        other = await sync_to_async(make_profile)('other', 'teacher')
+        with patch('journal.async_views.acached_gradebook_window') as load_window:
+            self.assertEqual((await self.get(other, 'course_detail_async', self.course.id)).status_code, 403)
+        # Журнал чужого курсу не завантажується і не кешується
+        load_window.assert_not_called()
+
+        newcomer = await sync_to_async(make_profile)('newcomer', 'student')
+        response = await self.get(newcomer, 'course_detail_async', self.course.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['enrolled'])
+        self.assertFalse(await Enrollment.objects.filter(course=self.course, student=newcomer).aexists())
+
+        response = await self.get(self.students[0], 'course_detail_async', self.course.id)
+        self.assertTrue(response.context['enrolled'])
+        self.assertEqual(len(response.context['lessons']), 3)
+
+    async def test_profile_dashboard_matches_sync_view(self):
+        response = await self.get(self.students[0], 'view_profile_async', self.students[0].user.id)
+
+        rows = response.context['course_details'][0]['rows']
+        self.assertEqual([row['grade'] for row in rows], [None, 64, None])
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        response = await self.async_client.get(reverse('home_async'))
+
+        self.assertEqual(response.status_code, 302)
+
+
+class SqliteBackendTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.wrappers = []
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        self.directory.cleanup()
+
+    def wrapper(self, profile='production', **options):
+        settings_dict = copy.deepcopy(connection.settings_dict)
+        settings_dict.update(copy.deepcopy(settings.SQLITE_PROFILES[profile]))
+        settings_dict['OPTIONS'].update(options)
+        settings_dict['NAME'] = os.path.join(self.directory.name, 'db.sqlite3')
+        wrapper = DatabaseWrapper(settings_dict, alias='sqlite_test')
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_production_profile_applies_pragmas(self):
+        wrapper = self.wrapper()
+
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64000)
+        self.assertEqual(self.pragma(wrapper, 'foreign_keys'), 1)
+
+    def test_transactions_begin_immediate(self):
+        wrapper = self.wrapper()
+        wrapper.force_debug_cursor = True
+        wrapper.ensure_connection()
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        try:
+            self.assertEqual(wrapper.queries[-1]['sql'], 'BEGIN IMMEDIATE')
+            # Блокування на запис взято ще до першого запису
+            other = self.wrapper(pragmas={'busy_timeout': 0})
+            with self.assertRaisesMessage(OperationalError, 'locked'):
+                other.cursor().execute('BEGIN IMMEDIATE')
+        finally:
+            wrapper.rollback()
+            wrapper.set_autocommit(True)
+
+    def test_plain_profile_keeps_django_defaults(self):
+        wrapper = self.wrapper('plain')
+        wrapper.force_debug_cursor = True
+        wrapper.ensure_connection()
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        wrapper.rollback()
+        wrapper.set_autocommit(True)
+
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertIn('BEGIN', [query['sql'] for query in wrapper.queries])
 
-# Create your tests here.
+    def test_invalid_transaction_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(transaction_mode='LATER').ensure_connection()
@@ -1,5 +1,5 @@
 from django.urls import path,include
-from . import views
+from . import api, async_views, views
 from django.views.i18n import set_language
 
 urlpatterns = [
@@ -10,12 +10,31 @@ urlpatterns = [
 
     path('course/<int:course_id>/remove_student/<int:enrollment_id>/', views.remove_student, name='remove_student'),
     path('course/<int:course_id>/', views.course_detail, name='course_detail'),
+    path('course/<int:course_id>/enroll/', views.enroll_course, name='enroll_course'),
+    path('course/<int:course_id>/lesson/<int:lesson_id>/grading/', views.lesson_grading, name='lesson_grading'),
+    path('course/<int:course_id>/gradebook/', views.save_gradebook, name='save_gradebook'),
+    path('course/<int:course_id>/analytics/', views.course_analytics, name='course_analytics'),
+    path('course/<int:course_id>/analytics.json', views.course_analytics_api, name='course_analytics_api'),
+    path('course/<int:course_id>/export/', views.export_course, name='export_course'),
+    path('course/<int:course_id>/import/', views.import_csv, name='import_csv'),
+    path('export/', views.export_courses, name='export_courses'),
     path('course/<int:course_id>/add_lesson/', views.add_lesson, name='add_lesson'),
     path('course/<int:lesson_id>/edit_lesson/', views.edit_lesson, name='edit_lesson'),
     path('course/<int:lesson_id>/delete_lesson/', views.delete_lesson, name='delete_lesson'),
     path('course/<int:course_id>/edit/', views.edit_course, name='edit_course'),
     path('course/<int:course_id>/add_student/', views.add_student, name='add_student'),
+    path('course/<int:course_id>/bulk_enroll/', views.bulk_enroll, name='bulk_enroll'),
+    path('course/<int:course_id>/students/search/', views.student_search, name='student_search'),
     path('course/<int:course_id>/remove_student/<int:enrollment_id>/', views.remove_student, name='remove_student'),
+    path('api/courses/', api.course_list, name='api_courses'),
+    path('api/courses/<int:course_id>/', api.course_info, name='api_course'),
+    path('api/courses/<int:course_id>/lessons/', api.course_lessons, name='api_course_lessons'),
+    path('api/courses/<int:course_id>/enrollments/', api.course_enrollments, name='api_course_enrollments'),
+    path('api/courses/<int:course_id>/gradebook/', api.course_gradebook, name='api_course_gradebook'),
+    # Асинхронні версії сторінок для роботи під ASGI
+    path('async/', async_views.home, name='home_async'),
+    path('async/course/<int:course_id>/', async_views.course_detail, name='course_detail_async'),
+    path('async/profile/<int:user_id>/', async_views.view_profile, name='view_profile_async'),
     path('profile/<int:user_id>/', views.view_profile, name='view_profile'),
     path('profile/<int:user_id>/update/', views.update_profile, name='update_profile'),
     path('profile/<int:user_id>/change_password/', views.change_password, name='change_password'),
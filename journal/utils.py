@@ -0,0 +1,8 @@
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Розбиває ітерований об'єкт на списки розміром не більше size."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
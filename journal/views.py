@@ -3,71 +3,57 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponseForbidden, HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
 from django.utils.translation import gettext as _
-from django.core.exceptions import MultipleObjectsReturned
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 
 from .forms import (
     AddStudentForm,
+    BulkEnrollForm,
     CourseForm,
+    GradebookForm,
     GradeForm,
+    ImportForm,
     LessonForm,
     UserUpdateForm,
     UserRegistrationForm,
 )
-from .models import Course, Profile, Lesson, Grade, Enrollment
+from .analytics import cached_course_analytics
+from .caching import course_student_ids, gradebook_cache_stats, home_courses
+from .dashboard import load_profile_dashboard
+from .enrollment import enroll_students, search_students
+from .export import EXPORT_FORMATS, course_sections
+from .gradebook import cached_gradebook_window, clean_grade, save_grade, save_grades
+from .imports import IMPORTERS
+from .metrics import collect, render_counters, render_prometheus
+from .models import Course, Profile, Lesson, Enrollment
 
 @login_required
 def view_profile(request, user_id):
     """Відображення профілю користувача."""
-    user = get_object_or_404(User, pk=user_id)
+    user = get_object_or_404(User.objects.select_related('profile'), pk=user_id)
     profile = user.profile
     is_teacher = request.user.profile.role == 'teacher'
-    
-    # Отримання курсів в залежності від ролі користувача
-    if is_teacher:
-        courses = Course.objects.filter(teacher=request.user.profile).distinct()
+
+    if request.method == 'POST' and is_teacher:
+        grade_form = GradeForm(request.POST)
+        if grade_form.is_valid():
+            lesson = grade_form.cleaned_data['lesson']
+            student = grade_form.cleaned_data['student']
+            if lesson.course.teacher_id != request.user.profile.id:
+                return HttpResponseForbidden(_("You are not the teacher of this course."))
+            if student.id not in course_student_ids(lesson.course_id):
+                return HttpResponseBadRequest(_("Unknown lesson or student of this course."))
+            save_grade(lesson.course_id, lesson.id, student.id, grade_form.cleaned_data['grade'])
+            return HttpResponseRedirect(reverse('view_profile', args=[user_id]))
     else:
-        courses = Course.objects.filter(enrollment__student=profile)
-
-    course_details = {}
-    for course in courses:
-        lessons = course.lesson_set.all()
-        course_grades = {}
-        for lesson in lessons:
-            # Викладач не повинен мати оцінок зі свого ж курсу
-            if is_teacher and course.teacher == profile:
-                continue
-
-            try:
-                grade = Grade.objects.filter(lesson=lesson, student=profile).latest('id')
-                course_grades[lesson] = grade.grade
-            except Grade.DoesNotExist:
-                course_grades[lesson] = None
-            except MultipleObjectsReturned:
-                grades = Grade.objects.filter(lesson=lesson, student=profile)
-                grade = grades.latest('id')
-                course_grades[lesson] = grade.grade
-
-        if not (is_teacher and course.teacher == profile):  # Додаткова перевірка, щоб викладач не бачив свої оцінки
-            course_details[course] = {
-                'lessons': lessons,
-                'grades': course_grades
-            }
-
-        if request.method == 'POST' and is_teacher:
-            grade_form = GradeForm(request.POST)
-            if grade_form.is_valid():
-                lesson = grade_form.cleaned_data['lesson']
-                student = grade_form.cleaned_data['student']
-                grade, created = Grade.objects.get_or_create(lesson=lesson, student=student)
-                grade.grade = grade_form.cleaned_data['grade']
-                grade.save()
-                return HttpResponseRedirect(reverse('view_profile', args=[user_id]))
-        else:
-            grade_form = GradeForm()
+        grade_form = GradeForm()
+
+    # Курси, заняття та оцінки завантажуються кількома запитами для всього профілю
+    course_details = load_profile_dashboard(profile, request.user.profile, is_teacher)
 
     user_form = None
     if request.user == user:
@@ -127,68 +113,250 @@ def change_password(request, user_id):
 @login_required
 def course_detail(request, course_id):
     """Деталі курсу."""
-    course = get_object_or_404(Course, id=course_id)
-    lessons = Lesson.objects.filter(course=course).order_by('schedule')
+    course = get_object_or_404(Course.objects.with_translations(), id=course_id)
     is_teacher = request.user.profile.role == 'teacher'
 
     if is_teacher:
         if course.teacher != request.user.profile:
             return HttpResponseForbidden(_("You are not the teacher of this course."))
 
-        enrollments = Enrollment.objects.filter(course=course)
         if request.method == 'POST':
             lesson_id = request.POST.get('lesson_id')
             student_id = request.POST.get('student_id')
             grade_value = request.POST.get('grade')
 
             if lesson_id and student_id and grade_value is not None:
-                grades = Grade.objects.filter(lesson_id=lesson_id, student_id=student_id)
-                if grades.exists():
-                    grade = grades.latest('id')
-                else:
-                    grade = Grade(lesson_id=lesson_id, student_id=student_id)
-                
-                grade.grade = grade_value
-                grade.save()
-                return HttpResponseRedirect(reverse('course_detail', args=[course_id]))
-
-        grades = {
-            enrollment.student.id: {
-                lesson.id: Grade.objects.filter(lesson=lesson, student=enrollment.student).first()
-                for lesson in lessons
-            }
-            for enrollment in enrollments
-        }
+                # Оцінку можна поставити лише студенту цього курсу за його заняття
+                if not (
+                    lesson_id.isdigit() and student_id.isdigit()
+                    and int(student_id) in course_student_ids(course.id)
+                    and Lesson.objects.filter(course=course, id=lesson_id).exists()
+                ):
+                    return HttpResponseBadRequest(_("Unknown lesson or student of this course."))
+                try:
+                    grade_value = clean_grade(grade_value)
+                except ValidationError as error:
+                    return HttpResponseBadRequest(' '.join(error.messages))
+                save_grade(course.id, int(lesson_id), int(student_id), grade_value)
+                return HttpResponseRedirect(_course_window_url(request, course_id))
+
+        gradebook = _gradebook_window(request, course)
 
         context = {
             'course': course,
-            'lessons': lessons,
+            'lessons': gradebook['lessons'],
             'is_teacher': True,
-            'enrollments': enrollments,
-            'grades': grades,
+            'enrollments': gradebook['enrollments'],
+            'grades': gradebook['grades'],
+            'edit_mode': request.GET.get('edit') == '1',
+            **window_links(request, gradebook['pages']),
         }
     else:
-        enrollment, created = Enrollment.objects.get_or_create(course=course, student=request.user.profile)
-        students = Profile.objects.filter(enrollment__course=course)
-        grades = {
-            student.id: {
-                lesson.id: Grade.objects.filter(lesson=lesson, student=student).first()
-                for lesson in lessons
-            }
-            for student in students
-        }
-
+        # Лише читання: запис на курс виконує окрема дія enroll_course
+        enrolled = request.user.profile.id in course_student_ids(course.id)
         context = {
             'course': course,
-            'lessons': lessons,
             'is_teacher': False,
-            'grades': grades,
-            'enrollment': enrollment,
-            'students': students
+            'enrolled': enrolled,
         }
+        if enrolled:
+            gradebook = _gradebook_window(request, course)
+            context.update({
+                'lessons': gradebook['lessons'],
+                'grades': gradebook['grades'],
+                'students': gradebook['students'],
+                **window_links(request, gradebook['pages']),
+            })
 
     return render(request, 'course_detail.html', context)
 
+@login_required
+@require_POST
+def enroll_course(request, course_id):
+    """Запис студента на курс."""
+    course = get_object_or_404(Course, id=course_id)
+    profile = request.user.profile
+    if profile.role != 'student':
+        return HttpResponseForbidden(_("Only students can enroll in courses."))
+
+    if profile.id not in course_student_ids(course.id):
+        Enrollment.objects.get_or_create(course=course, student=profile)
+    return redirect('course_detail', course_id=course.id)
+
+# Параметри GET, що задають вікно журналу на сторінці курсу
+WINDOW_PARAMS = ('students_after', 'students_before', 'lessons_after', 'lessons_before')
+
+def window_cursors(request):
+    """Курсори вікна журналу з параметрів запиту: {'students': (after, before), 'lessons': ...}."""
+    return {
+        'students': (request.GET.get('students_after'), request.GET.get('students_before')),
+        'lessons': (request.GET.get('lessons_after'), request.GET.get('lessons_before')),
+    }
+
+def _gradebook_window(request, course):
+    """Вікно журналу за курсорами з параметрів запиту."""
+    return cached_gradebook_window(course, **window_cursors(request))
+
+def _window_query(request, **cursors):
+    """Рядок запиту з поточними курсорами вікна, заміненими на cursors."""
+    params = request.GET.copy()
+    for key in list(params):
+        if key not in WINDOW_PARAMS:
+            del params[key]
+    for name, cursor in cursors.items():
+        params.pop(f'{name}_after', None)
+        params.pop(f'{name}_before', None)
+        params.update(cursor)
+    return params.urlencode()
+
+def _course_window_url(request, course_id):
+    query = _window_query(request)
+    return reverse('course_detail', args=[course_id]) + (f'?{query}' if query else '')
+
+def window_links(request, pages):
+    """Посилання на сусідні вікна студентів і занять та рядок запиту поточного вікна."""
+    links = {'window_query': _window_query(request)}
+    for name, page in pages.items():
+        links[f'{name}_previous_url'] = page['previous'] and '?' + _window_query(
+            request, **{name: {f'{name}_before': page['previous']}}
+        )
+        links[f'{name}_next_url'] = page['next'] and '?' + _window_query(
+            request, **{name: {f'{name}_after': page['next']}}
+        )
+    return links
+
+@login_required
+def lesson_grading(request, course_id, lesson_id):
+    """Фрагмент форми оцінювання заняття, який завантажується на вимогу."""
+    teacher_id = (
+        Lesson.objects.filter(id=lesson_id, course_id=course_id)
+        .values_list('course__teacher_id', flat=True)
+        .first()
+    )
+    if teacher_id is None:
+        raise Http404
+    if request.user.profile.role != 'teacher' or teacher_id != request.user.profile.id:
+        return HttpResponseForbidden(_("You are not the teacher of this course."))
+    return render(request, 'lesson_grading.html', {'course_id': course_id, 'lesson_id': lesson_id})
+
+@login_required
+@require_POST
+def save_gradebook(request, course_id):
+    """Збереження багатьох оцінок курсу одним запитом."""
+    course = get_object_or_404(Course, id=course_id)
+    if request.user.profile.role != 'teacher' or course.teacher != request.user.profile:
+        return HttpResponseForbidden(_("You are not the teacher of this course."))
+
+    form = GradebookForm(request.POST, course_id=course.id)
+    wants_json = 'application/json' in request.headers.get('Accept', '')
+
+    if form.is_valid():
+        saved = save_grades(course.id, form.cells)
+        if wants_json:
+            return JsonResponse({'saved': saved, 'errors': {}})
+        messages.success(request, _('Saved %(count)d grades.') % {'count': saved})
+        return redirect(_course_window_url(request, course.id))
+
+    if wants_json:
+        errors = {
+            f'grade-{student_id}-{lesson_id}': message
+            for student_id, row in form.cell_errors.items()
+            for lesson_id, message in row.items()
+        }
+        return JsonResponse({'saved': 0, 'errors': errors}, status=400)
+
+    # Показуємо введені значення разом з помилками біля відповідних комірок
+    gradebook = _gradebook_window(request, course)
+    for key, raw_value in request.POST.items():
+        match = GradebookForm.CELL_RE.fullmatch(key)
+        if match:
+            row = gradebook['grades'].get(int(match.group(1)))
+            if row is not None and int(match.group(2)) in row:
+                row[int(match.group(2))] = raw_value
+    return render(request, 'course_detail.html', {
+        'course': course,
+        'lessons': gradebook['lessons'],
+        'is_teacher': True,
+        'enrollments': gradebook['enrollments'],
+        'grades': gradebook['grades'],
+        'edit_mode': True,
+        'cell_errors': form.cell_errors,
+        **window_links(request, gradebook['pages']),
+    }, status=400)
+
+def _teacher_course(request, course_id):
+    """Курс викладача з перекладами або відповідь 403, якщо користувач не його викладач."""
+    course = get_object_or_404(Course.objects.with_translations(), id=course_id)
+    if request.user.profile.role != 'teacher' or course.teacher_id != request.user.profile.id:
+        return course, HttpResponseForbidden(_("You are not the teacher of this course."))
+    return course, None
+
+@login_required
+def course_analytics(request, course_id):
+    """Сторінка статистики оцінок курсу."""
+    course, forbidden = _teacher_course(request, course_id)
+    if forbidden:
+        return forbidden
+    return render(request, 'course_analytics.html', {
+        'course': course,
+        'analytics': cached_course_analytics(course),
+    })
+
+@login_required
+def course_analytics_api(request, course_id):
+    """Статистика оцінок курсу у форматі JSON."""
+    course, forbidden = _teacher_course(request, course_id)
+    if forbidden:
+        return forbidden
+    return JsonResponse(cached_course_analytics(course))
+
+def _export_response(request, sections, filename):
+    """Потокова відповідь з експортом у форматі з параметра ?format= (csv за замовчуванням)."""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(_("Unknown export format."))
+    stream, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(sections), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+@login_required
+def export_course(request, course_id):
+    """Експорт журналу курсу."""
+    course, forbidden = _teacher_course(request, course_id)
+    if forbidden:
+        return forbidden
+    return _export_response(request, course_sections([course]), f'course-{course.id}')
+
+@login_required
+def export_courses(request):
+    """Експорт журналів усіх курсів викладача."""
+    profile = request.user.profile
+    if profile.role != 'teacher':
+        return HttpResponseForbidden(_("Only teachers can export gradebooks."))
+    courses = Course.objects.filter(teacher=profile).with_translations().order_by('id')
+    return _export_response(request, course_sections(courses), 'courses')
+
+@login_required
+def import_csv(request, course_id):
+    """Імпорт записів на курс або оцінок з CSV-файлу з попередньою перевіркою."""
+    course, forbidden = _teacher_course(request, course_id)
+    if forbidden:
+        return forbidden
+
+    report = None
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            importer = IMPORTERS[form.cleaned_data['kind']]
+            report = importer(course, form.cleaned_data['file'], dry_run=form.cleaned_data['dry_run'])
+            if report.failure:
+                form.add_error('file', report.failure)
+    else:
+        form = ImportForm()
+
+    return render(request, 'import_csv.html', {'course': course, 'form': form, 'report': report})
+
 @login_required
 def remove_student(request, course_id, enrollment_id):
     """Видалення студента з курсу за допомогою enrollment_id."""
@@ -199,22 +367,17 @@ def remove_student(request, course_id, enrollment_id):
 @login_required
 def home(request):
     """Домашня сторінка з курсами користувача."""
-    profile = request.user.profile
-    
-    if profile.role == 'teacher':
-        courses = Course.objects.filter(teacher=profile)
-    else:  # роль 'student'
-        enrollments = Enrollment.objects.filter(student=profile)
-        courses = [enrollment.course for enrollment in enrollments]
+    # Список курсів кешується для кожного користувача та мови
+    courses = home_courses(request.user.profile)
     
     return render(request, 'home.html', {'courses': courses})
 
 @login_required
 def add_lesson(request, course_id):
     """Додавання уроку до курсу."""
-    course = get_object_or_404(Course, id=course_id)
-    if request.user.profile.role != 'teacher' or course.teacher != request.user.profile:
+    if not request.principal.teaches(course_id):
         return HttpResponseForbidden(_("Only the teacher of this course can add lessons."))
+    course = get_object_or_404(Course, id=course_id)
     if request.method == 'POST':
         form = LessonForm(request.POST)
         if form.is_valid():
@@ -229,9 +392,9 @@ def add_lesson(request, course_id):
 @login_required
 def edit_course(request, course_id):
     """Редагування курсу."""
-    course = get_object_or_404(Course, id=course_id)
-    if request.user.profile.role != 'teacher' or course.teacher != request.user.profile:
+    if not request.principal.teaches(course_id):
         return HttpResponseForbidden(_("Only the teacher of this course can edit it."))
+    course = get_object_or_404(Course.objects.with_translations(), id=course_id)
 
     if request.method == 'POST':
         form = CourseForm(request.POST, instance=course)
@@ -246,11 +409,10 @@ def edit_course(request, course_id):
 @login_required
 def add_student(request, course_id):
     """Додавання студента до курсу."""
-    course = get_object_or_404(Course, id=course_id)
-    
     # Перевірка чи користувач є викладачем курсу
-    if request.user.profile.role != 'teacher' or course.teacher != request.user.profile:
+    if not request.principal.teaches(course_id):
         return HttpResponseForbidden(_("Only the teacher of this course can add students."))
+    course = get_object_or_404(Course, id=course_id)
     
     if request.method == 'POST':
         form = AddStudentForm(request.POST, course_id=course_id)
@@ -263,18 +425,54 @@ def add_student(request, course_id):
     
     return render(request, 'add_student.html', {'form': form, 'course': course})
 
+@login_required
+def bulk_enroll(request, course_id):
+    """Масовий запис студентів на курс з підсумком доданих і пропущених."""
+    if not request.principal.teaches(course_id):
+        return HttpResponseForbidden(_("Only the teacher of this course can add students."))
+    course = get_object_or_404(Course.objects.with_translations(), id=course_id)
+    # Список можна скопіювати лише з власних курсів викладача
+    source_courses = [c for c in home_courses(request.user.profile) if c['id'] != course.id]
+
+    summary = None
+    if request.method == 'POST':
+        form = BulkEnrollForm(request.POST, source_courses=source_courses)
+        if form.is_valid():
+            summary = enroll_students(
+                course,
+                student_ids=form.cleaned_data['students'],
+                source_course_id=form.cleaned_data['source_course'],
+                usernames=form.cleaned_data['usernames'],
+            )
+            form = BulkEnrollForm(source_courses=source_courses)
+    else:
+        form = BulkEnrollForm(source_courses=source_courses)
+
+    return render(request, 'bulk_enroll.html', {'form': form, 'course': course, 'summary': summary})
+
+@login_required
+@require_GET
+def student_search(request, course_id):
+    """Студенти, яких можна записати на курс, за початком імені: JSON сторінками."""
+    if not request.principal.teaches(course_id):
+        return HttpResponseForbidden(_("Only the teacher of this course can add students."))
+    students, next_cursor = search_students(
+        course_id, request.GET.get('q', ''), after=request.GET.get('after'),
+    )
+    return JsonResponse({'results': students, 'next': next_cursor})
+
 @login_required
 def edit_lesson(request, lesson_id):
     """Редагування уроку."""
-    lesson = get_object_or_404(Lesson, id=lesson_id)
-    if request.user.profile.role != 'teacher' or lesson.course.teacher != request.user.profile:
+    lesson = get_object_or_404(Lesson.objects.with_translations(), id=lesson_id)
+    if not request.principal.teaches(lesson.course_id):
         return HttpResponseForbidden(_("Only the teacher of this lesson can edit it."))
     
     if request.method == 'POST':
         form = LessonForm(request.POST, instance=lesson)
         if form.is_valid():
             form.save()
-            return redirect('course_detail', course_id=lesson.course.id)
+            return redirect('course_detail', course_id=lesson.course_id)
     else:
         form = LessonForm(instance=lesson)
     
@@ -284,10 +482,10 @@ def edit_lesson(request, lesson_id):
 def delete_lesson(request, lesson_id):
     """Видалення уроку."""
     lesson = get_object_or_404(Lesson, id=lesson_id)
-    if request.user.profile.role != 'teacher' or lesson.course.teacher != request.user.profile:
+    if not request.principal.teaches(lesson.course_id):
         return HttpResponseForbidden(_("Only the teacher of this lesson can delete it."))
     
-    course_id = lesson.course.id
+    course_id = lesson.course_id
     lesson.delete()
     return redirect('course_detail', course_id=course_id)
 
@@ -326,3 +524,14 @@ def login(request):
     else:
         form = AuthenticationForm()
     return render(request, 'registration/login.html', {'form': form})
+
+def metrics(request):
+    """Метрики представлень у форматі Prometheus (лише для персоналу)."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden(_("Only staff members can view metrics."))
+    stats = gradebook_cache_stats()
+    body = render_prometheus(collect()) + render_counters({
+        'journal_gradebook_cache_hits_total': ('Gradebook cache hits.', stats['hits']),
+        'journal_gradebook_cache_misses_total': ('Gradebook cache misses.', stats['misses']),
+    })
+    return HttpResponse(body, content_type='text/plain; version=0.0.4')
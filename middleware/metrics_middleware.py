@@ -0,0 +1,44 @@
+# metrics_middleware.py
+
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from journal.metrics import get_config, registry
+
+
+class QueryCounter:
+    """Обгортка execute_wrapper, що лише рахує SQL-запити."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        registry.observe(view, latency_ms, counter.count, size)
+        registry.maybe_flush(config)
+        return response
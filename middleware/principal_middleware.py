@@ -0,0 +1,21 @@
+# principal_middleware.py
+
+from django.utils.functional import SimpleLazyObject
+
+from journal.principals import load_principal
+
+
+class PrincipalMiddleware:
+    """
+    Додає request.principal - роль і курси користувача для перевірок доступу.
+
+    Principal завантажується з кешу лише при першому зверненні, тому сторінки
+    без перевірок доступу не виконують зайвих запитів.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = SimpleLazyObject(lambda: load_principal(request.user))
+        return self.get_response(request)
@@ -0,0 +1,148 @@
+# query_budget_middleware.py
+
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('journal.queries')
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Можливі дії: 'log', 'header', 'raise'
+    'ACTIONS': ['log'],
+    # Скільки однакових запитів з одного місця вважаються N+1
+    'NPLUSONE_THRESHOLD': 5,
+    # Бюджет запитів для кожного імені URL з journal/urls.py
+    'BUDGETS': {},
+}
+
+_IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Кількість запитів представлення перевищила заданий бюджет."""
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'QUERY_BUDGET', {}))
+    return config
+
+
+def normalize_sql(sql):
+    """SQL без літералів і з однаковими списками IN, щоб групувати повтори."""
+    sql = _SPACE_RE.sub(' ', sql).strip()
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _STRING_RE.sub('?', sql)
+    return _NUMBER_RE.sub('?', sql)
+
+
+def call_site():
+    """Перший кадр стеку з коду проєкту, з якого було виконано запит."""
+    root = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and 'site-packages' not in filename and filename != __file__:
+            return f'{os.path.relpath(filename, root)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class QueryRecorder:
+    """Обгортка execute_wrapper, що запам'ятовує кожен SQL-запит запиту."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append((normalize_sql(sql), call_site()))
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated(self, threshold):
+        """Групи (SQL, місце виклику), що повторились щонайменше threshold разів."""
+        return [
+            (sql, site, count)
+            for (sql, site), count in Counter(self.statements).most_common()
+            if count >= threshold
+        ]
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        self.check(request, response, recorder, config)
+        return response
+
+    def check(self, request, response, recorder, config):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        budget = config['BUDGETS'].get(url_name)
+        repeated = recorder.repeated(config['NPLUSONE_THRESHOLD'])
+        over_budget = budget is not None and recorder.count > budget
+        actions = config['ACTIONS']
+
+        if 'header' in actions:
+            response['X-Query-Count'] = str(recorder.count)
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+            if repeated:
+                response['X-Query-NPlusOne'] = str(len(repeated))
+
+        if 'log' in actions:
+            for sql, site, count in repeated:
+                logger.warning('Possible N+1 in %s: %d x %s at %s', url_name, count, sql, site)
+            if over_budget:
+                logger.warning(
+                    'Query budget exceeded for %s: %d queries, budget %d',
+                    url_name, recorder.count, budget,
+                )
+
+        if 'raise' in actions and over_budget:
+            details = '\n'.join(f'{count} x {sql} at {site}' for sql, site, count in repeated)
+            raise QueryBudgetExceeded(
+                f'{url_name} ran {recorder.count} queries, budget is {budget}.\n{details}'
+            )
+
+
+def pin_query_budgets(**budgets):
+    """
+    Вмикає перевірку бюджетів у тестах: перевищення бюджету піднімає QueryBudgetExceeded.
+
+    Використовується як декоратор тестового класу/методу або контекстний менеджер:
+    ``@pin_query_budgets(home=8, course_detail=12)``.
+    """
+    from django.test.utils import override_settings
+
+    config = get_config()
+    config.update({
+        'ENABLED': True,
+        'ACTIONS': ['raise'],
+        'BUDGETS': {**config['BUDGETS'], **budgets},
+    })
+    return override_settings(QUERY_BUDGET=config)
@@ -0,0 +1,246 @@
+# session_log_writer.py
+
+import atexit
+import glob
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокування між процесами недоступне
+    fcntl = None
+
+from django.conf import settings
+
+logger = logging.getLogger('journal.session_log')
+
+DEFAULTS = {
+    'PATH': 'session_logs.txt',
+    # Ротація за розміром (байти) і за часом (секунди), 0 - вимкнено
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'ROTATE_INTERVAL': 24 * 60 * 60,
+    'BACKUP_COUNT': 7,
+    # Як часто і якими порціями фоновий потік записує чергу на диск
+    'FLUSH_INTERVAL': 1.0,
+    'BATCH_SIZE': 1000,
+}
+
+_STOP = object()
+
+
+class BufferedLogWriter:
+    """
+    Накопичує рядки журналу в пам'яті та записує їх пакетами з фонового потоку.
+
+    Кожен пакет дописується одним викликом os.write у файл, відкритий з O_APPEND,
+    під файловим блокуванням, тому записи кількох процесів не перемішуються,
+    а ротацію виконує лише один процес.
+    """
+
+    def __init__(self, path, max_bytes=0, rotate_interval=0, backup_count=7,
+                 flush_interval=1.0, batch_size=1000, formatter=str):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.formatter = formatter
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+
+    def write(self, record):
+        """Додає запис у чергу; нічого не робить з файлом у потоці запиту."""
+        if self._pid != os.getpid():
+            self._start()
+        self._queue.put(record)
+
+    def close(self):
+        """Записує все, що лишилось у черзі, та зупиняє фоновий потік."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout=10)
+        self._thread = None
+        self._pid = None
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Після fork потік батьківського процесу не існує, тому запускаємо новий
+            self._queue = queue.SimpleQueue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='session-log-writer', daemon=True)
+            self._thread.start()
+            # Обробники atexit успадковуються після fork, тому реєструємо лише раз
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            if stopping:
+                # Забираємо записи, що встигли потрапити в чергу перед зупинкою
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is not _STOP:
+                        batch.append(record)
+            if batch:
+                try:
+                    self._flush(batch)
+                except Exception:
+                    # Пакет втрачається, але потік продовжує роботу, інакше черга росла б без меж
+                    logger.exception('Could not write %d session log records to %s', len(batch), self.path)
+
+    def _flush(self, batch):
+        data = ''.join(f'{self.formatter(record)}\n' for record in batch).encode('utf-8')
+        with self._file_lock():
+            self._rotate_if_needed(len(data))
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def _file_lock(self):
+        return _FileLock(f'{self.path}.lock')
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_size == 0:
+            return
+
+        too_big = self.max_bytes and stat.st_size + incoming > self.max_bytes
+        # Файл ротується, якщо останній запис був в іншому часовому інтервалі
+        too_old = self.rotate_interval and (
+            int(stat.st_mtime // self.rotate_interval) != int(time.time() // self.rotate_interval)
+        )
+        if not (too_big or too_old):
+            return
+
+        suffix = time.strftime('%Y%m%d-%H%M%S', time.localtime(stat.st_mtime))
+        target = f'{self.path}.{suffix}'
+        counter = 1
+        while os.path.exists(target):
+            target = f'{self.path}.{suffix}.{counter}'
+            counter += 1
+        os.replace(self.path, target)
+        self._remove_old_backups()
+
+    def _remove_old_backups(self):
+        backups = sorted(
+            (path for path in glob.glob(f'{glob.escape(self.path)}.*') if not path.endswith('.lock')),
+            key=os.path.getmtime,
+        )
+        for path in backups[:max(len(backups) - self.backup_count, 0)]:
+            os.remove(path)
+
+
+class _FileLock:
+    """Ексклюзивне блокування файлу між процесами (flock)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+
+def format_session_record(record):
+    user, login_time, logout_time = record
+    return (
+        f"User: {user}, Login Time: {login_time}, Logout Time: {logout_time}, "
+        f"Session Duration: {logout_time - login_time}"
+    )
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _build_writer(config):
+    return BufferedLogWriter(
+        config['PATH'],
+        max_bytes=config['MAX_BYTES'],
+        rotate_interval=config['ROTATE_INTERVAL'],
+        backup_count=config['BACKUP_COUNT'],
+        flush_interval=config['FLUSH_INTERVAL'],
+        batch_size=config['BATCH_SIZE'],
+        formatter=format_session_record,
+    )
+
+
+def get_session_log_writer():
+    """Спільний для процесу записувач журналу сесій, налаштований через settings.SESSION_LOG."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            config = dict(DEFAULTS)
+            config.update(getattr(settings, 'SESSION_LOG', {}))
+            _writer = _build_writer(config)
+        return _writer
+
+
+@contextmanager
+def temporary_session_log():
+    """
+    Підміняє записувач процесу на журнал у тимчасовому каталозі.
+
+    Тести й вимірювання надсилають запити через middleware, але не повинні дописувати
+    записи в робочий журнал сесій.
+    """
+    global _writer
+    with tempfile.TemporaryDirectory() as directory:
+        config = dict(DEFAULTS)
+        config.update(getattr(settings, 'SESSION_LOG', {}))
+        config['PATH'] = os.path.join(directory, os.path.basename(str(config['PATH'])))
+        with _writer_lock:
+            saved, _writer = _writer, _build_writer(config)
+        try:
+            yield config['PATH']
+        finally:
+            with _writer_lock:
+                temporary, _writer = _writer, saved
+            temporary.close()
@@ -2,9 +2,12 @@
 
 import datetime
 
+from .session_log_writer import get_session_log_writer
+
 class SessionMonitoringMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.writer = get_session_log_writer()
 
     def __call__(self, request):
         # Логуємо час входу користувача
@@ -12,12 +15,8 @@ class SessionMonitoringMiddleware:
         
         response = self.get_response(request)
         
-        # Логуємо час виходу користувача та тривалість сесії
+        # Логуємо час виходу користувача; запис у файл виконує фоновий потік
         logout_time = datetime.datetime.now()
-        session_duration = logout_time - login_time
-        
-        # Зберігаємо дані про сесію в файл
-        with open('session_logs.txt', 'a') as file:
-            file.write(f"User: {request.user}, Login Time: {login_time}, Logout Time: {logout_time}, Session Duration: {session_duration}\n")
+        self.writer.write((str(request.user), login_time, logout_time))
 
         return response
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Під ASGI постійні з'єднання не використовуються повторно (див. SQLITE_PROFILES у settings)
+os.environ['JOURNAL_ASGI'] = '1'
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from django.utils.translation import gettext_lazy as _
 
@@ -44,10 +45,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'middleware.metrics_middleware.MetricsMiddleware',
+    'middleware.query_budget_middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'middleware.principal_middleware.PrincipalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -79,15 +83,83 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# JOURNAL_SQLITE обирає профіль SQLite: 'plain' (за замовчуванням) - стандартні налаштування
+# Django; 'production' - WAL, очікування блокувань замість помилок, BEGIN IMMEDIATE для
+# транзакцій і постійні з'єднання. Порівняння: manage.py benchmark_sqlite.
+# 'production' вмикається лише явно: перше ж з'єднання назавжди переводить файл бази в режим
+# WAL (змінює заголовок db.sqlite3 і створює файли -wal та -shm поруч з ним).
+# CONN_MAX_AGE профілю діє лише під WSGI: під ASGI з'єднання прив'язані до потоків виконання
+# і не використовуються повторно між запитами, а лише накопичуються. mysite/asgi.py встановлює
+# JOURNAL_ASGI, і тоді з'єднання закриваються після кожного запиту.
+
+SQLITE_PROFILES = {
+    'plain': {
+        'OPTIONS': {},
+        'CONN_MAX_AGE': 0,
+    },
+    'production': {
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                # Читачі не блокують запис і навпаки
+                'journal_mode': 'WAL',
+                # Скільки мс чекати на блокування, перш ніж повернути "database is locked"
+                'busy_timeout': 5000,
+                # У режимі WAL fsync потрібен лише під час checkpoint
+                'synchronous': 'NORMAL',
+                'mmap_size': 256 * 1024 * 1024,
+                # Від'ємне значення - розмір кешу сторінок у КБ на з'єднання
+                'cache_size': -64000,
+            },
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'journal.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **SQLITE_PROFILES[os.environ.get('JOURNAL_SQLITE', 'plain')],
+    }
+}
+if os.environ.get('JOURNAL_ASGI'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+
+
+# Cache
+# JOURNAL_CACHE обирає бекенд: 'memory' (за замовчуванням, кеш процесу), 'file' (для розробки,
+# спільний для процесів на одній машині) або повний шлях до класу бекенда Django
+# (наприклад django.core.cache.backends.redis.RedisCache) з адресою в JOURNAL_CACHE_LOCATION.
+# 'memory' придатний лише для одного процесу: версії курсів, списки курсів, Principal і списки
+# студентів скидаються лише в кеші процесу, що змінив дані, тому інші воркери віддавали б
+# застарілі журнали й права доступу. Для кількох воркерів потрібен спільний кеш (Redis, Memcached).
+
+CACHE_BACKENDS = {
+    'memory': ('django.core.cache.backends.locmem.LocMemCache', 'journal'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS.get(
+    os.environ.get('JOURNAL_CACHE', 'memory'),
+    (os.environ.get('JOURNAL_CACHE'), os.environ.get('JOURNAL_CACHE_LOCATION', '')),
+)
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.environ.get('JOURNAL_CACHE_LOCATION', _cache_location),
     }
 }
 
 
+# Користувач сесії завантажується разом з профілем. LegacySessionBackend лише відновлює
+# користувачів сесій, створених до появи ProfileBackend; паролі перевіряє тільки ProfileBackend.
+AUTHENTICATION_BACKENDS = [
+    'journal.auth.ProfileBackend',
+    'journal.auth.LegacySessionBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -169,3 +241,38 @@ LOCALE_PATHS = [
 
 LOGIN_URL = '/%s/login/' % LANGUAGE_CODE
 
+# Журнал сесій: записи буферизуються в пам'яті та пишуться на диск фоновим потоком.
+# Тести (TEST_RUNNER) і manage.py benchmark* пишуть журнал у тимчасовий каталог.
+SESSION_LOG = {
+    'PATH': BASE_DIR / 'session_logs.txt',
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'ROTATE_INTERVAL': 24 * 60 * 60,
+    'BACKUP_COUNT': 7,
+    'FLUSH_INTERVAL': 1.0,
+    'BATCH_SIZE': 1000,
+}
+
+TEST_RUNNER = 'mysite.test_runner.TestRunner'
+
+# Гістограми часу відповіді, кількості запитів і розміру відповідей для кожного представлення.
+# Воркери періодично скидають свої метрики в STORE_DIR, /metrics/ об'єднує їх.
+METRICS = {
+    'ENABLED': True,
+    'STORE_DIR': BASE_DIR / '.metrics',
+    'FLUSH_INTERVAL': 10.0,
+}
+
+# Підрахунок SQL-запитів для кожного представлення (вимкнено за замовчуванням).
+# ACTIONS: 'log' - попередження в лог, 'header' - заголовки X-Query-*,
+# 'raise' - виняток QueryBudgetExceeded (для тестів).
+QUERY_BUDGET = {
+    'ENABLED': False,
+    'ACTIONS': ['log', 'header'],
+    'NPLUSONE_THRESHOLD': 5,
+    'BUDGETS': {
+        'home': 10,
+        'course_detail': 12,
+        'view_profile': 12,
+    },
+}
+
@@ -0,0 +1,18 @@
+from contextlib import ExitStack
+
+from django.test.runner import DiscoverRunner
+
+from middleware.session_log_writer import temporary_session_log
+
+
+class TestRunner(DiscoverRunner):
+    """Стандартний запуск тестів, але журнал сесій пишеться в тимчасовий каталог."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._session_log = ExitStack()
+        self._session_log.enter_context(temporary_session_log())
+
+    def teardown_test_environment(self, **kwargs):
+        self._session_log.close()
+        super().teardown_test_environment(**kwargs)
@@ -3,7 +3,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.utils.translation import gettext_lazy as _
 
-urlpatterns = i18n_patterns(
+from journal import views as journal_views
+
+# Метрики доступні за стабільною адресою без префікса мови
+urlpatterns = [
+    path('metrics/', journal_views.metrics, name='metrics'),
+]
+
+urlpatterns += i18n_patterns(
     path(_('admin/'), admin.site.urls),
     path('', include('journal.urls')),
 )